@@ -10,7 +10,7 @@ class DataCleanupManager:
     
     def __init__(self):
         self.trades_file = "data/trades.json"
-        self.positions_file = "data/positions.json"
+        self.positions_dir = "data/positions"
         self.portfolios_file = "data/portfolios.json"
         self.archive_dir = "data/archives"
         self._ensure_directories()
@@ -19,6 +19,11 @@ class DataCleanupManager:
         """Create necessary directories."""
         os.makedirs("data", exist_ok=True)
         os.makedirs(self.archive_dir, exist_ok=True)
+        os.makedirs(self.positions_dir, exist_ok=True)
+    
+    def _positions_path(self, user_id: str) -> str:
+        """Get the positions file path for a single user."""
+        return os.path.join(self.positions_dir, f"{user_id}.json")
     
     def _load_json(self, filename: str) -> Dict:
         """Load JSON data from file."""
@@ -111,11 +116,10 @@ class DataCleanupManager:
         """Export all user trading data for download."""
         trades = self._load_json(self.trades_file)
         portfolios = self._load_json(self.portfolios_file)
-        positions = self._load_json(self.positions_file)
         
         user_trades = trades.get(user_id, [])
         user_portfolio = portfolios.get(user_id, {})
-        user_positions = positions.get(user_id, {})
+        user_positions = self._load_json(self._positions_path(user_id))
         
         if format == "csv":
             return self._export_as_csv(user_id, user_trades, user_portfolio, user_positions)
@@ -201,10 +205,9 @@ class DataCleanupManager:
         """Liquidate all user positions (convert to cash)."""
         from modules.market_data import MarketData
         
-        positions = self._load_json(self.positions_file)
         portfolios = self._load_json(self.portfolios_file)
         
-        user_positions = positions.get(user_id, {})
+        user_positions = self._load_json(self._positions_path(user_id))
         
         if not user_positions:
             return {
@@ -227,15 +230,13 @@ class DataCleanupManager:
                 # If can't get price, use avg_cost
                 total_value += position.get('avg_cost', 0) * position.get('quantity', 0)
         
-        # Clear positions
-        positions[user_id] = {}
-        
         # Add value to cash balance
         if user_id in portfolios:
             portfolios[user_id]['cash_balance'] = portfolios[user_id].get('cash_balance', 0) + total_value
             portfolios[user_id]['last_updated'] = datetime.now().isoformat()
         
-        self._save_json(self.positions_file, positions)
+        # Clear positions
+        self._save_json(self._positions_path(user_id), {})
         self._save_json(self.portfolios_file, portfolios)
         
         return {
@@ -248,10 +249,6 @@ class DataCleanupManager:
     def reset_user_to_starting_cash(self, user_id: str, starting_cash: float = 100000.0) -> Dict:
         """Reset user's cash balance to starting amount and clear positions."""
         portfolios = self._load_json(self.portfolios_file)
-        positions = self._load_json(self.positions_file)
-        
-        # Clear positions
-        positions[user_id] = {}
         
         # Reset cash balance
         if user_id in portfolios:
@@ -264,7 +261,8 @@ class DataCleanupManager:
                 'last_updated': datetime.now().isoformat()
             }
         
-        self._save_json(self.positions_file, positions)
+        # Clear positions
+        self._save_json(self._positions_path(user_id), {})
         self._save_json(self.portfolios_file, portfolios)
         
         return {
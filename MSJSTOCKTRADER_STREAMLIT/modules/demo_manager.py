@@ -240,19 +240,13 @@ class DemoManager:
     
     def _reset_positions(self):
         """Reset demo positions to empty."""
-        positions_file = os.path.join(self.data_dir, "positions.json")
+        positions_file = os.path.join(self.data_dir, "positions", "demo_user.json")
         
         if os.path.exists(positions_file):
             try:
-                with open(positions_file, 'r') as f:
-                    positions = json.load(f)
-                
                 # Remove demo positions
-                if "demo_user" in positions:
-                    positions["demo_user"] = {}
-                    
-                    with open(positions_file, 'w') as f:
-                        json.dump(positions, f, indent=2)
+                with open(positions_file, 'w') as f:
+                    json.dump({}, f, indent=2)
             except Exception as e:
                 print(f"Error resetting positions: {e}")
     
@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 import yfinance as yf
 import random
+from bisect import bisect_right
 from datetime import datetime, timedelta
 from typing import Dict, List
 import time
@@ -9,6 +10,45 @@ import time
 class MarketData:
     """Provides real market data using Yahoo Finance API with mock trading capabilities."""
     
+    # Separator between entries in the joined search buffers
+    _SEARCH_SEPARATOR = '\0'
+    
+    # Common search aliases used by search_stocks
+    _ALIASES = {
+        'google': ['GOOGL', 'GOOG'],
+        'alphabet': ['GOOGL', 'GOOG'], 
+        'facebook': ['META'],
+        'meta': ['META'],
+        'amazon': ['AMZN'],
+        'microsoft': ['MSFT'],
+        'apple': ['AAPL'],
+        'tesla': ['TSLA'],
+        'netflix': ['NFLX'],
+        'twitter': ['TWTR'],
+        'nvidia': ['NVDA'],
+        'intel': ['INTC'],
+        'amd': ['AMD'],
+        'walmart': ['WMT'],
+        'disney': ['DIS'],
+        'mcdonalds': ['MCD'],
+        'starbucks': ['SBUX'],
+        'coca cola': ['KO'],
+        'pepsi': ['PEP'],
+        'boeing': ['BA'],
+        'ford': ['F'],
+        'general motors': ['GM'],
+        'paypal': ['PYPL'],
+        'visa': ['V'],
+        'mastercard': ['MA'],
+        'jpmorgan': ['JPM'],
+        'jp morgan': ['JPM'],
+        'goldman sachs': ['GS'],
+        'bank of america': ['BAC'],
+        'johnson and johnson': ['JNJ'],
+        'pfizer': ['PFE'],
+        'moderna': ['MRNA']
+    }
+    
     def __init__(self):
         # Comprehensive list of major US stocks across different sectors
         self.symbols = [
@@ -97,6 +137,12 @@ class MarketData:
         self.cache_timestamp = {}
         self.cache_duration = 300  # 5 minutes cache
         
+        # Market status only changes on minute boundaries, cache it per minute
+        self._market_status_cache = (None, None)
+        
+        # Sector performance is mock data, regenerated only on refresh_data
+        self._sector_cache = None
+        
         # Asset categories properly organized for multi-asset trading
         self.asset_categories = {
             "Stocks": {
@@ -195,9 +241,45 @@ class MarketData:
             }
         }
         
+        # Lowercased symbols and company names, precomputed once for search
+        self._symbol_lower = [symbol.lower() for symbol in self.symbols]
+        self._symbol_set = set(self.symbols)
+        self._symbol_by_lower = dict(zip(self._symbol_lower, self.symbols))
+        self._name_mapping = self.get_stock_name_mapping()
+        self._name_lower = {
+            symbol: self._name_mapping.get(symbol, f"{symbol} Corporation").lower()
+            for symbol in self.symbols
+        }
+        
+        # Joined lowercase search buffers with per-symbol start offsets
+        self._symbol_buffer, self._symbol_offsets = self._build_search_buffer(self._symbol_lower)
+        self._name_buffer, self._name_offsets = self._build_search_buffer(
+            [self._name_lower[symbol] for symbol in self.symbols]
+        )
+        
         # Initialize real-time data fetching
         self._initialize_real_data()
     
+    def _build_search_buffer(self, entries: List[str]):
+        """Join entries into one searchable string and record where each starts."""
+        offsets = []
+        position = 0
+        for entry in entries:
+            offsets.append(position)
+            position += len(entry) + len(self._SEARCH_SEPARATOR)
+        # Sentinel past the end so the last entry has a successor offset
+        offsets.append(position)
+        return self._SEARCH_SEPARATOR.join(entries), offsets
+    
+    def _iter_buffer_matches(self, query: str, buffer: str, offsets: List[int]):
+        """Yield indices of buffer entries containing query, in entry order."""
+        start = buffer.find(query)
+        while start != -1:
+            index = bisect_right(offsets, start) - 1
+            yield index
+            # Resume at the next entry so each entry is reported once
+            start = buffer.find(query, offsets[index + 1])
+    
     def _initialize_real_data(self):
         """Initialize real market data connection."""
         # Warm up cache with a few key symbols
@@ -330,6 +412,41 @@ class MarketData:
                 self.cache_timestamp[symbol] = current_time
                 return rounded_price
     
+    def get_current_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Get current prices for several symbols, fetching stale ones in a single request."""
+        current_time = time.time()
+        prices = {}
+        stale = []
+        
+        for symbol in dict.fromkeys(symbols):
+            if (symbol in self.price_cache and 
+                symbol in self.cache_timestamp and
+                current_time - self.cache_timestamp[symbol] < self.cache_duration):
+                prices[symbol] = self.price_cache[symbol]
+            else:
+                stale.append(symbol)
+        
+        if len(stale) > 1:
+            try:
+                closes = yf.download(stale, period="1d", interval="1m", progress=False)['Close']
+                for symbol in stale:
+                    if symbol in closes:
+                        series = closes[symbol].dropna()
+                        if not series.empty:
+                            rounded_price = self._smart_round_price(float(series.iloc[-1]))
+                            self.price_cache[symbol] = rounded_price
+                            self.cache_timestamp[symbol] = current_time
+                            prices[symbol] = rounded_price
+            except Exception:
+                pass
+        
+        # Anything the batch request missed goes through the single-symbol fallbacks
+        for symbol in stale:
+            if symbol not in prices:
+                prices[symbol] = self.get_current_price(symbol)
+        
+        return prices
+    
     def get_stock_data(self, symbol: str, days: int = 30) -> pd.DataFrame:
         """Get real historical stock data for charting."""
         try:
@@ -642,50 +759,17 @@ class MarketData:
     def search_stocks(self, query: str) -> List[Dict]:
         """Enhanced search for stocks by symbol or name with aliases."""
         query_lower = query.lower().strip()
+        max_results = 15
         results = []
-        name_mapping = self.get_stock_name_mapping()
-        
-        # Define common search aliases
-        aliases = {
-            'google': ['GOOGL', 'GOOG'],
-            'alphabet': ['GOOGL', 'GOOG'], 
-            'facebook': ['META'],
-            'meta': ['META'],
-            'amazon': ['AMZN'],
-            'microsoft': ['MSFT'],
-            'apple': ['AAPL'],
-            'tesla': ['TSLA'],
-            'netflix': ['NFLX'],
-            'twitter': ['TWTR'],
-            'nvidia': ['NVDA'],
-            'intel': ['INTC'],
-            'amd': ['AMD'],
-            'walmart': ['WMT'],
-            'disney': ['DIS'],
-            'mcdonalds': ['MCD'],
-            'starbucks': ['SBUX'],
-            'coca cola': ['KO'],
-            'pepsi': ['PEP'],
-            'boeing': ['BA'],
-            'ford': ['F'],
-            'general motors': ['GM'],
-            'paypal': ['PYPL'],
-            'visa': ['V'],
-            'mastercard': ['MA'],
-            'jpmorgan': ['JPM'],
-            'jp morgan': ['JPM'],
-            'goldman sachs': ['GS'],
-            'bank of america': ['BAC'],
-            'johnson and johnson': ['JNJ'],
-            'pfizer': ['PFE'],
-            'moderna': ['MRNA']
-        }
+        seen = set()
+        name_mapping = self._name_mapping
         
         # First, check aliases
-        for alias, symbols in aliases.items():
+        for alias, symbols in self._ALIASES.items():
             if query_lower == alias or query_lower in alias:
                 for symbol in symbols:
-                    if symbol in self.symbols and symbol not in [r['symbol'] for r in results]:
+                    if symbol in self._symbol_set and symbol not in seen:
+                        seen.add(symbol)
                         company_name = name_mapping.get(symbol, f"{symbol} Corporation")
                         current_price = self.get_current_price(symbol)
                         results.append({
@@ -695,48 +779,51 @@ class MarketData:
                             'match_type': 'alias_match'
                         })
         
-        # Then, exact symbol matches
-        for symbol in self.symbols:
-            if symbol.lower() == query_lower and symbol not in [r['symbol'] for r in results]:
-                company_name = name_mapping.get(symbol, f"{symbol} Corporation")
-                current_price = self.get_current_price(symbol)
-                results.append({
-                    'symbol': symbol,
-                    'name': company_name,
-                    'price': current_price,
-                    'match_type': 'exact_symbol'
-                })
-        
-        # Then, partial symbol matches
-        for symbol in self.symbols:
-            if query_lower in symbol.lower() and symbol not in [r['symbol'] for r in results]:
-                company_name = name_mapping.get(symbol, f"{symbol} Corporation")
-                current_price = self.get_current_price(symbol)
-                results.append({
-                    'symbol': symbol,
-                    'name': company_name,
-                    'price': current_price,
-                    'match_type': 'partial_symbol'
-                })
-        
-        # Finally, company name matches
-        for symbol in self.symbols:
-            company_name = name_mapping.get(symbol, f"{symbol} Corporation")
-            if (query_lower in company_name.lower() and 
-                symbol not in [r['symbol'] for r in results]):
-                current_price = self.get_current_price(symbol)
+        # Then, exact symbol match via direct lookup
+        exact_matches = []
+        exact_symbol = self._symbol_by_lower.get(query_lower)
+        if exact_symbol is not None and exact_symbol not in seen:
+            seen.add(exact_symbol)
+            exact_matches.append(exact_symbol)
+
+        # Then partial symbol and company name matches, found by scanning the
+        # joined search buffers and stopping once the results are full
+        partial_matches, name_matches = [], []
+        remaining = max_results - len(results) - len(exact_matches)
+
+        if self._SEARCH_SEPARATOR not in query_lower:
+            for bucket, buffer, offsets in ((partial_matches, self._symbol_buffer, self._symbol_offsets),
+                                            (name_matches, self._name_buffer, self._name_offsets)):
+                for index in self._iter_buffer_matches(query_lower, buffer, offsets):
+                    if len(partial_matches) + len(name_matches) >= remaining:
+                        break
+                    symbol = self.symbols[index]
+                    if symbol not in seen:
+                        seen.add(symbol)
+                        bucket.append(symbol)
+
+        # Concatenate buckets by relevance, pricing only the symbols we return
+        for match_type, symbols in (('exact_symbol', exact_matches),
+                                    ('partial_symbol', partial_matches),
+                                    ('company_name', name_matches)):
+            for symbol in symbols:
+                if len(results) >= max_results:
+                    return results[:max_results]
                 results.append({
                     'symbol': symbol,
-                    'name': company_name,
-                    'price': current_price,
-                    'match_type': 'company_name'
+                    'name': name_mapping.get(symbol, f"{symbol} Corporation"),
+                    'price': self.get_current_price(symbol),
+                    'match_type': match_type
                 })
-        
+
         # Limit results and sort by relevance
-        return results[:15]
+        return results[:max_results]
     
     def get_sector_performance(self) -> pd.DataFrame:
         """Get sector performance data."""
+        if self._sector_cache is not None:
+            return self._sector_cache
+        
         sectors = [
             'Technology', 'Healthcare', 'Financials', 'Consumer Discretionary',
             'Communication Services', 'Industrials', 'Consumer Staples',
@@ -755,19 +842,27 @@ class MarketData:
                 'stocks_count': random.randint(50, 200)
             })
         
-        return pd.DataFrame(sector_data)
+        self._sector_cache = pd.DataFrame(sector_data)
+        return self._sector_cache
     
     def refresh_data(self):
         """Refresh market data by clearing cache."""
         # Clear price cache to force fresh data fetch
         self.price_cache.clear()
         self.cache_timestamp.clear()
+        self._sector_cache = None
         return {"success": True, "message": "Market data refreshed"}
     
     def get_market_status(self) -> Dict:
         """Get current market status."""
         # Mock market hours (simplified)
         now = datetime.now()
+        minute_key = now.replace(second=0, microsecond=0)
+        
+        cached_minute, cached_status = self._market_status_cache
+        if cached_minute == minute_key:
+            return cached_status
+        
         is_weekend = now.weekday() >= 5  # Saturday = 5, Sunday = 6
         current_hour = now.hour
         
@@ -787,10 +882,13 @@ class MarketData:
             else:
                 message = "Market is closed - After hours"
         
-        return {
+        market_status = {
             'status': status,
             'message': message,
             'is_open': status == "OPEN",
             'next_open': "9:30 AM ET" if status == "CLOSED" else None,
             'next_close': "4:00 PM ET" if status == "OPEN" else None
-        }
\ No newline at end of file
+        }
+        
+        self._market_status_cache = (minute_key, market_status)
+        return market_status
\ No newline at end of file
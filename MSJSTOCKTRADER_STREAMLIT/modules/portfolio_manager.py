@@ -1,24 +1,28 @@
 import pandas as pd
+import numpy as np
 import json
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
 import uuid
-import random
 
 class PortfolioManager:
     """Manages user portfolios, positions, and watchlists."""
     
     def __init__(self):
         self.portfolios_file = "data/portfolios.json"
-        self.positions_file = "data/positions.json"
+        self.positions_dir = "data/positions"
+        self.legacy_positions_file = "data/positions.json"
         self.watchlists_file = "data/watchlists.json"
+        self._rng = np.random.default_rng()
         self._ensure_data_directory()
         self._initialize_data()
     
     def _ensure_data_directory(self):
         """Create data directory if it doesn't exist."""
         os.makedirs("data", exist_ok=True)
+        os.makedirs(self.positions_dir, exist_ok=True)
     
     def _initialize_data(self):
         """Initialize portfolio data files."""
@@ -27,16 +31,34 @@ class PortfolioManager:
             default_portfolios = {}
             self._save_json(self.portfolios_file, default_portfolios)
         
-        # Initialize positions
-        if not os.path.exists(self.positions_file):
-            default_positions = {}
-            self._save_json(self.positions_file, default_positions)
+        # Split legacy all-users positions file into per-user files
+        if os.path.exists(self.legacy_positions_file):
+            self._migrate_legacy_positions()
         
         # Initialize watchlists
         if not os.path.exists(self.watchlists_file):
             default_watchlists = {}
             self._save_json(self.watchlists_file, default_watchlists)
     
+    def _migrate_legacy_positions(self):
+        """Move positions from the legacy positions.json into per-user files."""
+        positions = self._load_json(self.legacy_positions_file)
+        
+        for user_id, user_positions in positions.items():
+            # Never clobber a per-user file written since the migration started
+            if not os.path.exists(self._positions_path(user_id)):
+                self._save_json(self._positions_path(user_id), user_positions)
+        
+        try:
+            os.remove(self.legacy_positions_file)
+        except FileNotFoundError:
+            # Another instance already finished the migration
+            pass
+    
+    def _positions_path(self, user_id: str) -> str:
+        """Get the positions file path for a single user."""
+        return os.path.join(self.positions_dir, f"{user_id}.json")
+    
     def _load_json(self, filename: str) -> Dict:
         """Load JSON data from file."""
         try:
@@ -46,14 +68,21 @@ class PortfolioManager:
             return {}
     
     def _save_json(self, filename: str, data: Dict):
-        """Save JSON data to file."""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Save JSON data to file atomically via a temp file and rename."""
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(filename) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, filename)
+        except Exception:
+            # Leave the previous file intact and drop the partial temp file
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
     
     def create_portfolio(self, user_id: str, initial_cash: float = 100000.0) -> Dict:
         """Create a new portfolio for a user."""
         portfolios = self._load_json(self.portfolios_file)
-        positions = self._load_json(self.positions_file)
         watchlists = self._load_json(self.watchlists_file)
         
         # Check if portfolio already exists
@@ -71,15 +100,12 @@ class PortfolioManager:
             'last_updated': datetime.now().isoformat()
         }
         
-        # Initialize empty positions
-        positions[user_id] = {}
-        
         # Initialize empty watchlist
         watchlists[user_id] = []
         
         # Save all data
         self._save_json(self.portfolios_file, portfolios)
-        self._save_json(self.positions_file, positions)
+        self._save_json(self._positions_path(user_id), {})
         self._save_json(self.watchlists_file, watchlists)
         
         return {
@@ -98,10 +124,10 @@ class PortfolioManager:
         positions_value = 0.0
         
         if not positions.empty:
-            for _, position in positions.iterrows():
-                # Mock current price (in real app, would fetch from market data)
-                current_price = random.uniform(50, 200)
-                positions_value += position['quantity'] * current_price
+            # Mock current prices (in real app, would fetch from market data)
+            quantities = positions['quantity'].to_numpy()
+            current_prices = self._rng.uniform(50, 200, size=quantities.size)
+            positions_value = float((quantities * current_prices).sum())
         
         return cash_balance + positions_value
     
@@ -117,10 +143,10 @@ class PortfolioManager:
             positions_value = 0.0
             
             if not positions.empty:
-                for _, position in positions.iterrows():
-                    # Mock current price (in real app, would fetch from market data)  
-                    current_price = random.uniform(50, 200)
-                    positions_value += position['quantity'] * current_price
+                # Mock current prices (in real app, would fetch from market data)
+                quantities = positions['quantity'].to_numpy()
+                current_prices = self._rng.uniform(50, 200, size=quantities.size)
+                positions_value = float((quantities * current_prices).sum())
             
             total_value = cash_balance + positions_value
             
@@ -173,62 +199,59 @@ class PortfolioManager:
     
     def get_positions(self, user_id: str) -> pd.DataFrame:
         """Get current long positions for user (quantity > 0)."""
-        positions = self._load_json(self.positions_file)
-        
-        user_positions = positions.get(user_id, {})
+        user_positions = self._load_json(self._positions_path(user_id))
         
         if not user_positions:
             return pd.DataFrame(columns=['symbol', 'quantity', 'avg_cost', 'market_value', 'unrealized_pnl'])
         
         # Convert to DataFrame - only long positions
-        positions_list = []
-        for symbol, position_data in user_positions.items():
-            quantity = position_data['quantity']
-            # Only include long positions (positive quantity)
-            if quantity > 0:
-                positions_list.append({
-                    'symbol': symbol,
-                    'quantity': position_data['quantity'],
-                    'avg_cost': position_data['avg_cost'],
-                    'last_updated': position_data['last_updated']
-                })
-        
-        return pd.DataFrame(positions_list)
+        return self._positions_frame(user_positions, short=False)
     
     def get_short_positions(self, user_id: str) -> pd.DataFrame:
         """Get current short positions for user (quantity < 0)."""
-        positions = self._load_json(self.positions_file)
-        
-        user_positions = positions.get(user_id, {})
+        user_positions = self._load_json(self._positions_path(user_id))
         
         if not user_positions:
             return pd.DataFrame(columns=['symbol', 'quantity', 'avg_cost', 'market_value', 'unrealized_pnl'])
         
         # Convert to DataFrame - only short positions
-        positions_list = []
+        return self._positions_frame(user_positions, short=True)
+    
+    def get_position(self, user_id: str, symbol: str) -> Optional[Dict]:
+        """Get a user's position in one symbol (negative quantity for shorts), or None."""
+        position_data = self._load_json(self._positions_path(user_id)).get(symbol)
+        if position_data is None:
+            return None
+        
+        return {'symbol': symbol, **position_data}
+    
+    def _positions_frame(self, user_positions: Dict, short: bool) -> pd.DataFrame:
+        """Build a typed positions DataFrame from column lists."""
+        symbols, quantities, avg_costs, timestamps = [], [], [], []
+        
         for symbol, position_data in user_positions.items():
             quantity = position_data['quantity']
-            # Only include short positions (negative quantity)
-            if quantity < 0:
-                positions_list.append({
-                    'symbol': symbol,
-                    'quantity': position_data['quantity'],
-                    'avg_cost': position_data['avg_cost'],
-                    'last_updated': position_data['last_updated']
-                })
-        
-        return pd.DataFrame(positions_list)
+            # Short positions have negative quantity, long positions positive
+            if (quantity < 0) if short else (quantity > 0):
+                symbols.append(symbol)
+                quantities.append(quantity)
+                avg_costs.append(position_data['avg_cost'])
+                timestamps.append(position_data['last_updated'])
+        
+        return pd.DataFrame({
+            'symbol': symbols,
+            'quantity': np.asarray(quantities, dtype=np.int64),
+            'avg_cost': np.asarray(avg_costs, dtype=np.float64),
+            'last_updated': timestamps
+        })
     
     def update_position(self, user_id: str, symbol: str, quantity: int, price: float):
         """Update or create position for user."""
-        positions = self._load_json(self.positions_file)
-        
-        if user_id not in positions:
-            positions[user_id] = {}
+        positions = self._load_json(self._positions_path(user_id))
         
-        if symbol in positions[user_id]:
+        if symbol in positions:
             # Update existing position
-            current_pos = positions[user_id][symbol]
+            current_pos = positions[symbol]
             current_quantity = current_pos['quantity']
             current_avg_cost = current_pos['avg_cost']
             
@@ -238,23 +261,23 @@ class PortfolioManager:
             
             if new_quantity != 0:
                 new_avg_cost = total_value / new_quantity
-                positions[user_id][symbol] = {
+                positions[symbol] = {
                     'quantity': new_quantity,
                     'avg_cost': new_avg_cost,
                     'last_updated': datetime.now().isoformat()
                 }
             else:
                 # Position closed
-                del positions[user_id][symbol]
+                del positions[symbol]
         else:
             # New position
-            positions[user_id][symbol] = {
+            positions[symbol] = {
                 'quantity': quantity,
                 'avg_cost': price,
                 'last_updated': datetime.now().isoformat()
             }
         
-        self._save_json(self.positions_file, positions)
+        self._save_json(self._positions_path(user_id), positions)
     
     def get_buying_power(self, user_id: str) -> float:
         """Get available buying power (simplified calculation)."""
@@ -276,30 +299,36 @@ class PortfolioManager:
         if today_trades.empty:
             return 0.0
         
+        # Average cost per symbol from positions, loaded once for all sells
+        positions = self.get_positions(user_id)
+        avg_cost_map = dict(zip(positions['symbol'], positions['avg_cost'])) if not positions.empty else {}
+        
+        # Fetch each bought symbol's current price once
+        current_prices = {}
+        for symbol in today_trades.loc[today_trades['side'] == 'buy', 'symbol'].unique():
+            try:
+                current_prices[symbol] = market_data.get_current_price(symbol)
+            except:
+                # If can't get current price, assume no change
+                pass
+        
         # Calculate P&L from today's trades
         total_pnl = 0.0
         
         for _, trade in today_trades.iterrows():
             if trade['side'] == 'buy':
                 # For buys, calculate unrealized P&L based on current price
-                try:
-                    current_price = market_data.get_current_price(trade['symbol'])
+                current_price = current_prices.get(trade['symbol'])
+                if current_price is not None:
                     buy_value = trade['quantity'] * trade['price']
                     current_value = trade['quantity'] * current_price
                     total_pnl += (current_value - buy_value)
-                except:
-                    # If can't get current price, assume no change
-                    pass
             else:  # sell
-                # For sells, we realize the P&L
-                # Get average cost from positions before this sale
-                positions = self.get_positions(user_id)
-                if not positions.empty:
-                    symbol_pos = positions[positions['symbol'] == trade['symbol']]
-                    if not symbol_pos.empty:
-                        avg_cost = symbol_pos.iloc[0]['avg_cost']
-                        sell_price = trade['price']
-                        total_pnl += (sell_price - avg_cost) * trade['quantity']
+                # For sells, we realize the P&L against the position's average cost
+                avg_cost = avg_cost_map.get(trade['symbol'])
+                if avg_cost is not None:
+                    sell_price = trade['price']
+                    total_pnl += (sell_price - avg_cost) * trade['quantity']
         
         return total_pnl
     
@@ -316,15 +345,14 @@ class PortfolioManager:
             user_trades = []
         
         end_date = datetime.now()
-        dates = [end_date - timedelta(days=i) for i in range(days)]
-        dates.reverse()
+        dates = pd.date_range(end=end_date, periods=days, freq='D')
         
         # If no trades, show flat line at starting value
         if not user_trades:
             starting_value = 100000.0
             return pd.DataFrame({
                 'date': dates,
-                'value': [starting_value] * len(dates)
+                'value': np.full(len(dates), starting_value)
             })
         
         # If trades exist, calculate actual values based on current portfolio
@@ -333,14 +361,7 @@ class PortfolioManager:
         # Create realistic history showing gradual changes
         # Start from 100k and show progression to current value
         starting_value = 100000.0
-        value_change = current_value - starting_value
-        
-        values = []
-        for i in range(len(dates)):
-            # Gradual progression from start to current
-            progress = i / max(1, len(dates) - 1)
-            value = starting_value + (value_change * progress)
-            values.append(value)
+        values = np.linspace(starting_value, current_value, len(dates))
         
         return pd.DataFrame({
             'date': dates,
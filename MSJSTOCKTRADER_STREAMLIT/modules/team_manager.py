@@ -1,17 +1,45 @@
+import gzip
+import heapq
 import json
 import os
+import tempfile
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import streamlit as st
 
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library serializer
+    orjson = None
+
 class TeamManager:
     """Manages team creation, competitions, and leaderboards."""
     
     def __init__(self):
         self.teams_file = "data/teams.json"
-        self.team_competitions_file = "data/team_competitions.json"
-        self.solo_competitions_file = "data/solo_competitions.json"
+        # Competitions are only read by TeamManager, so they are stored gzipped.
+        # teams.json stays plain JSON because ChatManager reads it directly.
+        self.team_competitions_file = "data/team_competitions.json.gz"
+        self.solo_competitions_file = "data/solo_competitions.json.gz"
+        self._cache = {}  # file_path -> parsed data
+        self._mtime = {}  # file_path -> (mtime_ns, size) of the cached data
+        self._buffering = False
+        self._dirty = set()  # file paths with cached changes not yet written
+        self.valuation_workers = 8  # threads used to value member portfolios
+        self._user_index = {}  # username -> team_id of the first team they belong to
+        self._name_index = {}  # lowercased team name -> team_id
+        self._member_sets = {}  # team_id -> set of member usernames
+        self._indexed_teams = None  # teams dict the user index was built from
+        self._all_teams_cache = (None, None)  # (teams dict, team rows built from it)
+        self.leaderboard_ttl = 30  # seconds a computed leaderboard is reused
+        self._leaderboard_cache = (0.0, None)  # (computed_at, leaderboard)
+        self._active_competition_ids = {}  # file_path -> ids of competitions not yet over
+        self._indexed_competitions = {}  # file_path -> competitions dict the ids were built from
         self._ensure_data_files()
     
     def _ensure_data_files(self):
@@ -20,35 +48,144 @@ class TeamManager:
         
         for file_path in [self.teams_file, self.team_competitions_file, self.solo_competitions_file]:
             if not os.path.exists(file_path):
-                with open(file_path, 'w') as f:
-                    json.dump({}, f)
+                self._migrate_uncompressed(file_path)
+            if not os.path.exists(file_path):
+                self._write_data(file_path, {})
+    
+    def _migrate_uncompressed(self, file_path: str):
+        """Compress the plain JSON file a .gz data file replaces, if one exists."""
+        if not file_path.endswith('.gz'):
+            return
+        
+        legacy_path = file_path[:-len('.gz')]
+        if os.path.exists(legacy_path):
+            self._write_data(file_path, self._load_data(legacy_path))
+            os.remove(legacy_path)
+    
+    def _file_signature(self, file_path: str) -> tuple:
+        """Get a cheap signature that changes whenever the file is rewritten."""
+        stat = os.stat(file_path)
+        return (stat.st_mtime_ns, stat.st_size)
     
     def _load_data(self, file_path: str) -> Dict:
-        """Load data from JSON file."""
+        """Load data from JSON file, reusing the parsed copy while the file is unchanged."""
+        if file_path in self._dirty:
+            return self._cache[file_path]
+        
         try:
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            signature = self._file_signature(file_path)
+            if self._mtime.get(file_path) == signature:
+                return self._cache[file_path]
+            
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            if file_path.endswith('.gz'):
+                raw = gzip.decompress(raw)
+            data = orjson.loads(raw) if orjson else json.loads(raw)
+        except (FileNotFoundError, json.JSONDecodeError, gzip.BadGzipFile, EOFError):
             return {}
+        
+        self._cache[file_path] = data
+        self._mtime[file_path] = signature
+        return data
     
     def _save_data(self, file_path: str, data: Dict):
-        """Save data to JSON file."""
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Save data to JSON file, or defer the write while buffering."""
+        if file_path == self.teams_file:
+            # Teams may have been changed in place, so the rows are stale
+            self._all_teams_cache = (None, None)
+        
+        if self._buffering:
+            self._cache[file_path] = data
+            self._dirty.add(file_path)
+            return
+        
+        self._write_data(file_path, data)
+    
+    def _write_data(self, file_path: str, data: Dict):
+        """Write data to JSON file atomically and refresh the cached copy."""
+        if orjson:
+            # Portfolio values can be numpy scalars, which the stdlib encoder accepted
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            payload = json.dumps(data, indent=2).encode()
+        if file_path.endswith('.gz'):
+            # Level 1 keeps CPU cost low; repetitive JSON still compresses well
+            payload = gzip.compress(payload, compresslevel=1)
+        
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, file_path)
+        except Exception:
+            # Leave the previous file intact and drop the partial temp file
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        self._cache[file_path] = data
+        self._mtime[file_path] = self._file_signature(file_path)
+    
+    def flush(self):
+        """Write every file with deferred changes."""
+        dirty, self._dirty = self._dirty, set()
+        for file_path in dirty:
+            self._write_data(file_path, self._cache[file_path])
+    
+    @contextmanager
+    def buffered(self):
+        """Defer file writes inside the block and write each changed file once on exit."""
+        if self._buffering:
+            # Nested block: the outermost one flushes
+            yield
+            return
+        
+        self._buffering = True
+        try:
+            yield
+        finally:
+            self._buffering = False
+            self.flush()
+    
+    def _load_teams(self) -> Dict:
+        """Load teams, rebuilding the username -> team_id index if the file changed."""
+        teams = self._load_data(self.teams_file)
+        if teams is not self._indexed_teams:
+            self._reindex_teams(teams)
+        return teams
+    
+    def _reindex_teams(self, teams: Dict):
+        """Rebuild the username and team name indexes from the teams dict."""
+        user_index = {}
+        name_index = {}
+        member_sets = {}
+        for team_id, team_data in teams.items():
+            member_sets[team_id] = set(team_data["members"])
+            for member in team_data["members"]:
+                # Keep the first team a user appears in, matching a linear scan
+                user_index.setdefault(member, team_id)
+            # Teams written by ChatManager don't carry name_lower
+            name_index[team_data.get("name_lower") or team_data["name"].lower()] = team_id
+        self._user_index = user_index
+        self._name_index = name_index
+        self._member_sets = member_sets
+        self._indexed_teams = teams
     
     def create_team(self, team_name: str, creator_username: str, description: str = "") -> Dict:
         """Create a new team."""
-        teams = self._load_data(self.teams_file)
+        teams = self._load_teams()
         
         # Check if team name already exists
-        for team_id, team_data in teams.items():
-            if team_data["name"].lower() == team_name.lower():
-                return {"success": False, "message": "Team name already exists"}
+        name_lower = team_name.lower()
+        if name_lower in self._name_index:
+            return {"success": False, "message": "Team name already exists"}
         
         team_id = str(uuid.uuid4())
         team_data = {
             "id": team_id,
             "name": team_name,
+            "name_lower": name_lower,
             "description": description,
             "creator": creator_username,
             "members": [creator_username],
@@ -62,40 +199,49 @@ class TeamManager:
         
         teams[team_id] = team_data
         self._save_data(self.teams_file, teams)
+        self._user_index.setdefault(creator_username, team_id)
+        self._name_index[name_lower] = team_id
+        self._member_sets[team_id] = {creator_username}
+        self._invalidate_leaderboard()
         
         return {"success": True, "message": "Team created successfully", "team_id": team_id}
     
     def join_team(self, team_id: str, username: str) -> Dict:
         """Join an existing team."""
-        teams = self._load_data(self.teams_file)
+        teams = self._load_teams()
         
         if team_id not in teams:
             return {"success": False, "message": "Team not found"}
         
         team = teams[team_id]
         
-        if username in team["members"]:
+        members = self._member_sets[team_id]
+        
+        if username in members:
             return {"success": False, "message": "Already a member of this team"}
         
-        if len(team["members"]) >= 10:  # Max team size
+        if len(members) >= 10:  # Max team size
             return {"success": False, "message": "Team is full (maximum 10 members)"}
         
         team["members"].append(username)
+        members.add(username)
         teams[team_id] = team
         self._save_data(self.teams_file, teams)
+        self._user_index.setdefault(username, team_id)
+        self._invalidate_leaderboard()
         
         return {"success": True, "message": "Successfully joined team"}
     
     def leave_team(self, team_id: str, username: str) -> Dict:
         """Leave a team."""
-        teams = self._load_data(self.teams_file)
+        teams = self._load_teams()
         
         if team_id not in teams:
             return {"success": False, "message": "Team not found"}
         
         team = teams[team_id]
         
-        if username not in team["members"]:
+        if username not in self._member_sets[team_id]:
             return {"success": False, "message": "Not a member of this team"}
         
         team["members"].remove(username)
@@ -107,56 +253,88 @@ class TeamManager:
             # Delete empty team
             del teams[team_id]
             self._save_data(self.teams_file, teams)
+            self._reindex_teams(teams)
+            self._invalidate_leaderboard()
             return {"success": True, "message": "Left team (team deleted as it was empty)"}
         
         teams[team_id] = team
         self._save_data(self.teams_file, teams)
+        self._reindex_teams(teams)
+        self._invalidate_leaderboard()
         
         return {"success": True, "message": "Successfully left team"}
     
     def get_user_team(self, username: str) -> Optional[Dict]:
         """Get the team a user belongs to."""
-        teams = self._load_data(self.teams_file)
+        teams = self._load_teams()
         
-        for team_id, team_data in teams.items():
-            if username in team_data["members"]:
-                return {"team_id": team_id, **team_data}
+        team_id = self._user_index.get(username)
+        if team_id is None:
+            return None
         
-        return None
+        return {"team_id": team_id, **teams[team_id]}
     
     def get_all_teams(self) -> List[Dict]:
         """Get all teams."""
         teams = self._load_data(self.teams_file)
-        return [{"team_id": team_id, **team_data} for team_id, team_data in teams.items()]
+        cached_teams, team_rows = self._all_teams_cache
+        if cached_teams is not teams:
+            team_rows = [{"team_id": team_id, **team_data} for team_id, team_data in teams.items()]
+            self._all_teams_cache = (teams, team_rows)
+        return team_rows
     
-    def update_team_values(self, portfolio_manager):
-        """Update team total values based on member portfolios."""
-        teams = self._load_data(self.teams_file)
-        
-        for team_id, team_data in teams.items():
-            total_value = 0.0
+    def update_team_values(self, portfolio_manager) -> Dict:
+        """Update team total values based on member portfolios and return the teams."""
+        with self.buffered():
+            teams = self._load_data(self.teams_file)
             
-            for member in team_data["members"]:
-                try:
-                    portfolio = portfolio_manager.get_portfolio(member)
-                    if portfolio:
-                        portfolio_value = portfolio_manager.calculate_portfolio_value(member)
-                        total_value += portfolio_value
-                except:
-                    continue
+            # Value each member once, even if they appear on several teams.
+            # Valuations are I/O bound, so run them concurrently.
+            unique_members = list(dict.fromkeys(
+                member for team_data in teams.values() for member in team_data["members"]
+            ))
+            member_values = {}
+            if unique_members:
+                with ThreadPoolExecutor(max_workers=min(self.valuation_workers, len(unique_members))) as executor:
+                    values = executor.map(
+                        lambda member: self._get_member_value(portfolio_manager, member),
+                        unique_members
+                    )
+                    member_values = dict(zip(unique_members, values))
+            
+            changed = False
+            for team_id, team_data in teams.items():
+                total_value = sum(member_values[member] for member in team_data["members"])
+                if team_data.get("total_value") != total_value:
+                    teams[team_id]["total_value"] = total_value
+                    changed = True
             
-            teams[team_id]["total_value"] = total_value
+            # Only rewrite teams.json when a team total actually moved
+            if changed:
+                self._save_data(self.teams_file, teams)
         
-        self._save_data(self.teams_file, teams)
+        return teams
     
-    def get_team_leaderboard(self, portfolio_manager) -> List[Dict]:
-        """Get team leaderboard sorted by total portfolio value."""
-        self.update_team_values(portfolio_manager)
-        teams = self._load_data(self.teams_file)
+    def _get_member_value(self, portfolio_manager, member: str) -> float:
+        """Get a member's portfolio value, or 0.0 if it can't be calculated."""
+        try:
+            portfolio = portfolio_manager.get_portfolio(member)
+            if portfolio:
+                return portfolio_manager.calculate_portfolio_value(member)
+        except:
+            pass
+        return 0.0
+    
+    def get_team_leaderboard(self, portfolio_manager, top_n: Optional[int] = None) -> List[Dict]:
+        """Get team leaderboard sorted by total portfolio value, optionally only the top N teams."""
+        computed_at, leaderboard = self._leaderboard_cache
+        if leaderboard is not None and time.time() - computed_at < self.leaderboard_ttl:
+            return leaderboard if top_n is None else leaderboard[:top_n]
         
-        team_list = []
-        for team_id, team_data in teams.items():
-            team_list.append({
+        teams = self.update_team_values(portfolio_manager)
+        
+        team_rows = (
+            {
                 "team_id": team_id,
                 "name": team_data["name"],
                 "members": team_data["members"],
@@ -165,20 +343,35 @@ class TeamManager:
                 "competitions_won": team_data.get("competitions_won", 0),
                 "badges": team_data.get("badges", []),
                 "captain": team_data["captain"]
-            })
+            }
+            for team_id, team_data in teams.items()
+        )
+        
+        if top_n is not None:
+            # Partial sort; a truncated board isn't cached for full-board callers
+            return heapq.nlargest(top_n, team_rows, key=lambda x: x["total_value"])
         
-        return sorted(team_list, key=lambda x: x["total_value"], reverse=True)
+        leaderboard = sorted(team_rows, key=lambda x: x["total_value"], reverse=True)
+        self._leaderboard_cache = (time.time(), leaderboard)
+        return leaderboard
+    
+    def _invalidate_leaderboard(self):
+        """Force the next get_team_leaderboard call to recompute team values."""
+        self._leaderboard_cache = (0.0, None)
     
     def start_competition(self, competition_type: str, name: str, duration_days: int = 7) -> Dict:
         """Start a new competition."""
         competition_id = str(uuid.uuid4())
+        now = datetime.now()
+        end = now + timedelta(days=duration_days)
         
         competition_data = {
             "id": competition_id,
             "name": name,
             "type": competition_type,  # "solo" or "team"
-            "start_date": datetime.now().isoformat(),
-            "end_date": (datetime.now() + timedelta(days=duration_days)).isoformat(),
+            "start_date": now.isoformat(),
+            "end_date": end.isoformat(),
+            "end_ts": end.timestamp(),
             "duration_days": duration_days,
             "is_active": True,
             "participants": [],
@@ -187,9 +380,10 @@ class TeamManager:
         }
         
         file_path = self.team_competitions_file if competition_type == "team" else self.solo_competitions_file
-        competitions = self._load_data(file_path)
+        competitions = self._load_competitions(file_path)
         competitions[competition_id] = competition_data
         self._save_data(file_path, competitions)
+        self._active_competition_ids[file_path].append(competition_id)
         
         return {"success": True, "competition_id": competition_id}
     
@@ -208,24 +402,46 @@ class TeamManager:
                 {"position": 3, "badge": "solo_bronze", "name": "Solo Bronze Medal"}
             ]
     
+    def _load_competitions(self, file_path: str) -> Dict:
+        """Load competitions, rebuilding the active id index if the file changed."""
+        competitions = self._load_data(file_path)
+        if competitions is not self._indexed_competitions.get(file_path):
+            self._active_competition_ids[file_path] = [
+                comp_id for comp_id, comp_data in competitions.items() if comp_data["is_active"]
+            ]
+            self._indexed_competitions[file_path] = competitions
+        return competitions
+    
+    def _get_active_from(self, file_path: str, current_ts: float) -> List[Dict]:
+        """Get active competitions from one file, sweeping finished ones out of the index."""
+        competitions = self._load_competitions(file_path)
+        
+        active = []
+        still_active_ids = []
+        for comp_id in self._active_competition_ids[file_path]:
+            comp_data = competitions[comp_id]
+            end_ts = comp_data.get("end_ts")
+            if end_ts is None:
+                # Competitions started before end_ts was stored
+                end_ts = comp_data["end_ts"] = datetime.fromisoformat(comp_data["end_date"]).timestamp()
+            if comp_data["is_active"] and current_ts < end_ts:
+                still_active_ids.append(comp_id)
+                active.append({"competition_id": comp_id, **comp_data})
+        
+        self._active_competition_ids[file_path] = still_active_ids
+        return active
+    
     def get_active_competitions(self) -> Dict:
         """Get all active competitions."""
-        team_competitions = self._load_data(self.team_competitions_file)
-        solo_competitions = self._load_data(self.solo_competitions_file)
-        
-        active_team = []
-        active_solo = []
+        current_ts = time.time()
         
-        current_time = datetime.now()
-        
-        for comp_id, comp_data in team_competitions.items():
-            end_date = datetime.fromisoformat(comp_data["end_date"])
-            if comp_data["is_active"] and current_time < end_date:
-                active_team.append({"competition_id": comp_id, **comp_data})
-        
-        for comp_id, comp_data in solo_competitions.items():
-            end_date = datetime.fromisoformat(comp_data["end_date"])
-            if comp_data["is_active"] and current_time < end_date:
-                active_solo.append({"competition_id": comp_id, **comp_data})
-        
-        return {"team": active_team, "solo": active_solo}
\ No newline at end of file
+        return {
+            "team": self._get_active_from(self.team_competitions_file, current_ts),
+            "solo": self._get_active_from(self.solo_competitions_file, current_ts)
+        }
+
+
+@st.cache_resource
+def get_team_manager() -> TeamManager:
+    """Get the shared TeamManager so its caches and indexes survive Streamlit reruns."""
+    return TeamManager()
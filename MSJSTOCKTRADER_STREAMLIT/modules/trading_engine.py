@@ -1,12 +1,27 @@
 import pandas as pd
+import numpy as np
+import heapq
 import json
 import os
+import tempfile
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 import uuid
+from contextlib import contextmanager
+from functools import cached_property
+from operator import itemgetter
 import random
 import pytz
 
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library serializer
+    orjson = None
+
+_REQUIRED_ORDER_FIELDS = frozenset({'symbol', 'side', 'quantity', 'order_type', 'user_id'})
+
 class TradingEngine:
     """Handles trade execution and order management with market hours support."""
     
@@ -15,6 +30,17 @@ class TradingEngine:
         self.trades_file = "data/trades.json"
         self.market_open_hour = 13  # 1:00 PM PST
         self.timezone = pytz.timezone('America/Los_Angeles')  # PST/PDT timezone
+        self._cache = {}  # filename -> parsed data
+        self._mtime = {}  # filename -> (mtime_ns, size) of the cached data
+        self._batching = False
+        self._dirty = set()  # filenames with cached changes not yet written
+        self._trades_by_user_date = {}  # (user_id, 'YYYY-MM-DD') -> that user's trades executed that day
+        self._indexed_trades = None  # trades dict the date index was built from
+        self._order_index = {}  # (user_id, order_id) -> order
+        self._indexed_orders = None  # orders dict the order index was built from
+        self._daily_stats_cache = (None, None)  # (epoch second, (trade count, volume))
+        self._market_open_cache = (None, None)  # (epoch second, is_market_open result)
+        self._next_open_cache = (None, None)  # (epoch second, get_next_market_open result)
         self._ensure_data_directory()
         self._initialize_data()
     
@@ -30,67 +56,217 @@ class TradingEngine:
         if not os.path.exists(self.trades_file):
             self._save_json(self.trades_file, {})
     
+    @cached_property
+    def _portfolio_manager(self):
+        """PortfolioManager shared by every order this engine places."""
+        from modules.portfolio_manager import PortfolioManager
+        return PortfolioManager()
+    
+    @cached_property
+    def _market_data(self):
+        """MarketData shared by every order this engine places."""
+        from modules.market_data import MarketData
+        return MarketData()
+    
+    def _file_signature(self, filename: str) -> tuple:
+        """Get a cheap signature that changes whenever the file is rewritten."""
+        stat = os.stat(filename)
+        return (stat.st_mtime_ns, stat.st_size)
+    
     def _load_json(self, filename: str) -> Dict:
-        """Load JSON data from file."""
+        """Load JSON data from file, reusing the parsed copy while the file is unchanged.
+        Other modules write trades.json too, so the cache is keyed on the file signature.
+        """
+        if filename in self._dirty:
+            return self._cache[filename]
+        
         try:
-            with open(filename, 'r') as f:
-                return json.load(f)
+            signature = self._file_signature(filename)
+            if self._mtime.get(filename) == signature:
+                return self._cache[filename]
+            
+            with open(filename, 'rb') as f:
+                raw = f.read()
+            data = orjson.loads(raw) if orjson else json.loads(raw)
         except (FileNotFoundError, json.JSONDecodeError):
             return {}
+        
+        self._cache[filename] = data
+        self._mtime[filename] = signature
+        return data
     
     def _save_json(self, filename: str, data: Dict):
-        """Save JSON data to file."""
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Save JSON data to file, or defer the write while batching."""
+        if self._batching:
+            self._cache[filename] = data
+            self._dirty.add(filename)
+            return
+        
+        self._write_json(filename, data)
+    
+    def _write_json(self, filename: str, data: Dict):
+        """Write JSON data to file atomically and refresh the cached copy."""
+        # Orders and trades are only read by code, so skip pretty-printing
+        if orjson:
+            # Prices can be numpy scalars, which the stdlib encoder accepts
+            payload = orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            payload = json.dumps(data).encode()
+        
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(filename) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+                # Make sure the data is on disk before it replaces the only copy
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, filename)
+        except Exception:
+            # Leave the previous file intact and drop the partial temp file
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        self._cache[filename] = data
+        self._mtime[filename] = self._file_signature(filename)
+    
+    def _flush(self):
+        """Write every file with deferred changes."""
+        dirty, self._dirty = self._dirty, set()
+        for filename in dirty:
+            self._write_json(filename, self._cache[filename])
+    
+    @contextmanager
+    def _batched_writes(self):
+        """Defer JSON writes inside the block and write each changed file once on exit."""
+        if self._batching:
+            # Nested block: the outermost one flushes
+            yield
+            return
+        
+        self._batching = True
+        try:
+            yield
+        finally:
+            self._batching = False
+            self._flush()
+    
+    def _load_orders(self) -> Dict:
+        """Load orders, rebuilding the order id index if the file changed."""
+        orders = self._load_json(self.orders_file)
+        if orders is not self._indexed_orders:
+            self._reindex_orders(orders)
+        return orders
+    
+    def _reindex_orders(self, orders: Dict):
+        """Rebuild the (user_id, order_id) -> order index."""
+        order_index = {}
+        for user_id, user_orders in orders.items():
+            # Safety check: ensure user_orders is a list and each order is a dict
+            if not isinstance(user_orders, list):
+                continue
+            for order in user_orders:
+                if isinstance(order, dict):
+                    # Keep the first order with an id, matching a linear scan
+                    order_index.setdefault((user_id, order.get('order_id')), order)
+        self._order_index = order_index
+        self._indexed_orders = orders
+    
+    def _load_trades(self) -> Dict:
+        """Load trades, rebuilding the (user_id, date) index if the file changed."""
+        trades = self._load_json(self.trades_file)
+        if trades is not self._indexed_trades:
+            self._reindex_trades(trades)
+        return trades
+    
+    def _reindex_trades(self, trades: Dict):
+        """Rebuild the (user_id, date) -> trades index."""
+        trades_by_user_date = {}
+        for user_id, user_trades in trades.items():
+            for trade in user_trades:
+                # The first 10 characters of an ISO timestamp are its date
+                trades_by_user_date.setdefault((user_id, trade['executed_at'][:10]), []).append(trade)
+        self._trades_by_user_date = trades_by_user_date
+        self._indexed_trades = trades
+    
+    def _daily_stats(self) -> tuple:
+        """Get today's (trade count, volume) across all users in one pass.
+        Reused within the same second so dashboards asking for both scan once.
+        """
+        current_second = int(time.time())
+        cached_second, stats = self._daily_stats_cache
+        if cached_second == current_second:
+            return stats
+        
+        self._load_trades()
+        today = datetime.now().date().isoformat()
+        total_trades = 0
+        total_volume = 0.0
+        for (user_id, trade_date), date_trades in self._trades_by_user_date.items():
+            if trade_date == today:
+                total_trades += len(date_trades)
+                for trade in date_trades:
+                    total_volume += trade['value']
+        
+        stats = (total_trades, total_volume)
+        self._daily_stats_cache = (current_second, stats)
+        return stats
     
     def is_market_open(self) -> bool:
         """Check if market is currently open for trading.
         Market hours: Weekdays (Mon-Fri), starting at 1:00 PM PST.
         Market is closed on weekends (Saturday and Sunday).
         """
-        now_pst = datetime.now(self.timezone)
+        # The answer can only change on a second boundary
+        current_second = int(time.time())
+        cached_second, is_open = self._market_open_cache
+        if cached_second == current_second:
+            return is_open
         
-        # Check if it's a weekend
-        if now_pst.weekday() >= 5:  # 5 = Saturday, 6 = Sunday
-            return False
+        now_pst = datetime.now(self.timezone)
         
-        # Check if it's after market open time (1:00 PM PST)
-        if now_pst.hour < self.market_open_hour:
-            return False
+        # Check if it's a weekend (5 = Saturday, 6 = Sunday) or before
+        # market open time (1:00 PM PST)
+        is_open = now_pst.weekday() < 5 and now_pst.hour >= self.market_open_hour
         
-        return True
+        self._market_open_cache = (current_second, is_open)
+        return is_open
     
     def get_next_market_open(self) -> datetime:
         """Get the next market open time (1:00 PM PST on next weekday)."""
-        now_pst = datetime.now(self.timezone)
-        next_open = now_pst.replace(hour=self.market_open_hour, minute=0, second=0, microsecond=0)
-        
-        # If today's market time hasn't passed yet and it's a weekday
-        if next_open > now_pst and now_pst.weekday() < 5:
+        current_second = int(time.time())
+        cached_second, next_open = self._next_open_cache
+        if cached_second == current_second:
             return next_open
         
-        # Move to next day
-        next_open += timedelta(days=1)
+        now_pst = datetime.now(self.timezone)
+        next_open = now_pst.replace(hour=self.market_open_hour, minute=0, second=0, microsecond=0)
         
-        # Skip weekends
-        while next_open.weekday() >= 5:  # Skip Saturday (5) and Sunday (6)
+        # If today's market time has passed or it's a weekend, move to the next weekday
+        if not (next_open > now_pst and now_pst.weekday() < 5):
+            # Move to next day
             next_open += timedelta(days=1)
+            
+            # Skip weekends
+            while next_open.weekday() >= 5:  # Skip Saturday (5) and Sunday (6)
+                next_open += timedelta(days=1)
         
+        self._next_open_cache = (current_second, next_open)
         return next_open
     
     def place_order(self, order_data: Dict) -> Dict:
         """Place a trading order."""
-        from modules.portfolio_manager import PortfolioManager
-        from modules.market_data import MarketData
-        
-        portfolio_manager = PortfolioManager()
-        market_data = MarketData()
+        portfolio_manager = self._portfolio_manager
+        market_data = self._market_data
         
         # Validate order data
-        required_fields = ['symbol', 'side', 'quantity', 'order_type', 'user_id']
-        for field in required_fields:
-            if field not in order_data:
-                return {"success": False, "message": f"Missing required field: {field}"}
+        missing_fields = _REQUIRED_ORDER_FIELDS - order_data.keys()
+        if missing_fields:
+            label = "field" if len(missing_fields) == 1 else "fields"
+            return {"success": False, "message": f"Missing required {label}: {', '.join(sorted(missing_fields))}"}
+        
+        # Price fetched for validation, reused when the order executes
+        current_price = None
         
         # Check buying power for buy orders
         if order_data['side'] == 'buy':
@@ -112,30 +288,20 @@ class TradingEngine:
         
         # Check position for sell orders
         if order_data['side'] == 'sell':
-            positions = portfolio_manager.get_positions(order_data['user_id'])
-            if positions.empty:
-                return {"success": False, "message": "No positions to sell"}
-            
-            symbol_position = positions[positions['symbol'] == order_data['symbol']]
-            if symbol_position.empty:
+            position = portfolio_manager.get_position(order_data['user_id'], order_data['symbol'])
+            if position is None or position['quantity'] <= 0:
                 return {"success": False, "message": f"No position in {order_data['symbol']}"}
             
-            available_quantity = symbol_position.iloc[0]['quantity']
-            if float(order_data['quantity']) > available_quantity:
+            if float(order_data['quantity']) > position['quantity']:
                 return {"success": False, "message": "Insufficient shares to sell"}
         
         # Check short position for short cover orders
         if order_data['side'] == 'short_cover':
-            short_positions = portfolio_manager.get_short_positions(order_data['user_id'])
-            if short_positions.empty:
-                return {"success": False, "message": "No short positions to cover"}
-            
-            symbol_position = short_positions[short_positions['symbol'] == order_data['symbol']]
-            if symbol_position.empty:
+            position = portfolio_manager.get_position(order_data['user_id'], order_data['symbol'])
+            if position is None or position['quantity'] >= 0:
                 return {"success": False, "message": f"No short position in {order_data['symbol']}"}
             
-            available_quantity = abs(symbol_position.iloc[0]['quantity'])
-            if float(order_data['quantity']) > available_quantity:
+            if float(order_data['quantity']) > abs(position['quantity']):
                 return {"success": False, "message": "Insufficient short shares to cover"}
         
         # Generate order ID
@@ -157,27 +323,23 @@ class TradingEngine:
             'filled_quantity': 0
         }
         
-        # Save order
-        orders = self._load_json(self.orders_file)
-        if order_data['user_id'] not in orders:
-            orders[order_data['user_id']] = []
-        
-        orders[order_data['user_id']].append(order)
-        self._save_json(self.orders_file, orders)
-        
-        # Execute order immediately (for demo/educational platform)
-        # Note: Real market hours are tracked but orders execute instantly for better UX
-        execution_result = self._execute_order(order)
-        market_status = "open" if self.is_market_open() else "closed (simulated execution)"
-        
-        # Update the order in the orders file (change from pending to filled)
-        orders = self._load_json(self.orders_file)
-        if order_data['user_id'] in orders:
-            for i, stored_order in enumerate(orders[order_data['user_id']]):
-                if stored_order['order_id'] == order_id:
-                    orders[order_data['user_id']][i] = order
-                    break
-        self._save_json(self.orders_file, orders)
+        with self._batched_writes():
+            # Save order
+            orders = self._load_orders()
+            if order_data['user_id'] not in orders:
+                orders[order_data['user_id']] = []
+            
+            orders[order_data['user_id']].append(order)
+            self._order_index.setdefault((order_data['user_id'], order_id), order)
+            self._save_json(self.orders_file, orders)
+            
+            # Execute order immediately (for demo/educational platform)
+            # Note: Real market hours are tracked but orders execute instantly for better UX
+            execution_result = self._execute_order(order, reference_price=current_price)
+            market_status = "open" if self.is_market_open() else "closed (simulated execution)"
+            
+            # Save the order again now that it's filled; it is the same dict stored in orders
+            self._save_json(self.orders_file, orders)
         
         return {
             "success": True, 
@@ -187,19 +349,22 @@ class TradingEngine:
             "execution_result": execution_result
         }
     
-    def _execute_order(self, order: Dict) -> Dict:
-        """Execute an order (simplified simulation)."""
-        from modules.portfolio_manager import PortfolioManager
-        from modules.market_data import MarketData
-        
-        portfolio_manager = PortfolioManager()
-        market_data = MarketData()
+    def _execute_order(self, order: Dict, slippage: Optional[float] = None,
+                       reference_price: Optional[float] = None) -> Dict:
+        """Execute an order (simplified simulation).
+        A pre-drawn slippage and an already fetched market price can be passed in.
+        """
+        portfolio_manager = self._portfolio_manager
         
-        # Get current market price
-        current_price = market_data.get_current_price(order['symbol'])
+        # Get current market price unless the caller just fetched it
+        if reference_price is not None:
+            current_price = reference_price
+        else:
+            current_price = self._market_data.get_current_price(order['symbol'])
         
         # Simulate execution price (add some slippage)
-        slippage = random.uniform(-0.01, 0.01)  # ±1% slippage
+        if slippage is None:
+            slippage = random.uniform(-0.01, 0.01)  # ±1% slippage
         execution_price = current_price * (1 + slippage)
         
         # Update order status
@@ -281,45 +446,46 @@ class TradingEngine:
             'executed_at': datetime.now().isoformat()
         }
         
-        trades = self._load_json(self.trades_file)
+        trades = self._load_trades()
         if order['user_id'] not in trades:
             trades[order['user_id']] = []
         
         trades[order['user_id']].append(trade)
+        self._trades_by_user_date.setdefault((order['user_id'], trade['executed_at'][:10]), []).append(trade)
+        self._daily_stats_cache = (None, None)
         self._save_json(self.trades_file, trades)
     
     def get_pending_orders(self, user_id: str = None) -> List[Dict]:
         """Get all pending orders, optionally filtered by user_id."""
         orders = self._load_json(self.orders_file)
         
-        pending_orders = []
+        # Estimated execution time shared by every pending order
+        next_open = self.get_next_market_open()
+        next_open_iso = next_open.isoformat()
+        next_open_formatted = next_open.strftime('%A, %B %d at %I:%M %p PST')
         
         if user_id:
             # Get pending orders for specific user
-            user_orders = orders.get(user_id, [])
-            # Safety check: ensure user_orders is a list and each order is a dict
-            if isinstance(user_orders, list):
-                pending_orders = [order for order in user_orders if isinstance(order, dict) and order.get('status') == 'pending']
-            else:
-                pending_orders = []
+            user_order_lists = [(user_id, orders.get(user_id, []))]
         else:
             # Get all pending orders across all users
-            for uid, user_orders in orders.items():
-                # Safety check: ensure user_orders is a list
-                if not isinstance(user_orders, list):
-                    continue
-                for order in user_orders:
-                    # Safety check: ensure order is a dict
-                    if isinstance(order, dict) and order.get('status') == 'pending':
-                        order_copy = order.copy()
-                        order_copy['user_id'] = uid
-                        pending_orders.append(order_copy)
-        
-        # Add estimated execution time to each order
-        next_open = self.get_next_market_open()
-        for order in pending_orders:
-            order['estimated_execution'] = next_open.isoformat()
-            order['estimated_execution_formatted'] = next_open.strftime('%A, %B %d at %I:%M %p PST')
+            user_order_lists = orders.items()
+        
+        pending_orders = []
+        for uid, user_orders in user_order_lists:
+            # Safety check: ensure user_orders is a list
+            if not isinstance(user_orders, list):
+                continue
+            for order in user_orders:
+                # Safety check: ensure order is a dict
+                if isinstance(order, dict) and order.get('status') == 'pending':
+                    # Build a new dict so nothing leaks into the cached orders
+                    pending_orders.append({
+                        **order,
+                        'user_id': uid,
+                        'estimated_execution': next_open_iso,
+                        'estimated_execution_formatted': next_open_formatted
+                    })
         
         return pending_orders
     
@@ -332,29 +498,33 @@ class TradingEngine:
                 "processed_count": 0
             }
         
-        orders = self._load_json(self.orders_file)
-        processed_count = 0
-        failed_count = 0
-        
-        # Process all pending orders
-        for user_id, user_orders in orders.items():
-            for i, order in enumerate(user_orders):
-                if order['status'] == 'pending':
-                    try:
-                        # Execute the order
-                        execution_result = self._execute_order(order)
-                        
-                        # Update the order in the stored data
-                        orders[user_id][i] = order
-                        processed_count += 1
-                    except Exception as e:
-                        # Mark order as failed
-                        orders[user_id][i]['status'] = 'failed'
-                        orders[user_id][i]['failure_reason'] = str(e)
-                        failed_count += 1
-        
-        # Save updated orders
-        self._save_json(self.orders_file, orders)
+        # Trades from every order are written once at the end
+        with self._batched_writes():
+            orders = self._load_json(self.orders_file)
+            processed_count = 0
+            failed_count = 0
+            
+            # Collect pending orders first so every slippage comes from one draw
+            pending_orders = [
+                order for user_orders in orders.values() for order in user_orders
+                if order['status'] == 'pending'
+            ]
+            slippages = np.random.uniform(-0.01, 0.01, size=len(pending_orders))  # ±1% slippage
+            
+            # Process all pending orders; each is updated in place in the stored data
+            for order, slippage in zip(pending_orders, slippages):
+                try:
+                    # Execute the order
+                    execution_result = self._execute_order(order, slippage=float(slippage))
+                    processed_count += 1
+                except Exception as e:
+                    # Mark order as failed
+                    order['status'] = 'failed'
+                    order['failure_reason'] = str(e)
+                    failed_count += 1
+            
+            # Save updated orders
+            self._save_json(self.orders_file, orders)
         
         return {
             "success": True,
@@ -383,8 +553,9 @@ class TradingEngine:
         
         user_trades = trades.get(user_id, [])
         
-        # Sort by execution time and limit
-        user_trades = sorted(user_trades, key=lambda x: x['executed_at'], reverse=True)[:limit]
+        # Newest trades first; trades written by other modules may be out of order,
+        # so take the top `limit` by timestamp instead of slicing the list
+        user_trades = heapq.nlargest(limit, user_trades, key=itemgetter('executed_at'))
         
         if not user_trades:
             return pd.DataFrame(columns=['trade_id', 'symbol', 'side', 'quantity', 'price', 'value', 'executed_at'])
@@ -406,34 +577,23 @@ class TradingEngine:
         if not user_trades:
             return pd.DataFrame(columns=['Symbol', 'Side', 'Quantity', 'Price', 'Value', 'Date'])
         
-        # Convert to DataFrame
-        df_data = []
-        for trade in user_trades:
-            df_data.append({
-                'Symbol': trade['symbol'],
-                'Side': trade['side'].title(),
-                'Quantity': trade['quantity'],
-                'Price': f"${trade['price']:.2f}",
-                'Value': f"${trade['value']:,.2f}",
-                'Date': datetime.fromisoformat(trade['executed_at']).strftime('%Y-%m-%d %H:%M')
-            })
-        
-        return pd.DataFrame(df_data)
+        # Convert to DataFrame and format whole columns at once
+        trades_df = pd.DataFrame(user_trades, columns=['symbol', 'side', 'quantity', 'price', 'value', 'executed_at'])
+        return pd.DataFrame({
+            'Symbol': trades_df['symbol'],
+            'Side': trades_df['side'].str.title(),
+            'Quantity': trades_df['quantity'],
+            'Price': trades_df['price'].map('${:.2f}'.format),
+            'Value': trades_df['value'].map('${:,.2f}'.format),
+            'Date': pd.to_datetime(trades_df['executed_at'], format='ISO8601').dt.strftime('%Y-%m-%d %H:%M')
+        })
     
     def get_today_trades(self, user_id: str) -> pd.DataFrame:
         """Get today's trades for a user."""
-        trades = self._load_json(self.trades_file)
-        
-        user_trades = trades.get(user_id, [])
+        self._load_trades()
         
-        # Filter for today's trades
-        today = datetime.now().date()
-        today_trades = []
-        
-        for trade in user_trades:
-            trade_date = datetime.fromisoformat(trade['executed_at']).date()
-            if trade_date == today:
-                today_trades.append(trade)
+        today = datetime.now().date().isoformat()
+        today_trades = self._trades_by_user_date.get((user_id, today), [])
         
         if not today_trades:
             return pd.DataFrame(columns=['trade_id', 'symbol', 'side', 'quantity', 'price', 'value', 'executed_at'])
@@ -446,12 +606,10 @@ class TradingEngine:
         
         user_trades = trades.get(user_id, [])
         
-        # Filter trades by date range
-        filtered_trades = []
-        for trade in user_trades:
-            trade_date = datetime.fromisoformat(trade['executed_at']).date()
-            if start_date.date() <= trade_date <= end_date.date():
-                filtered_trades.append(trade)
+        # Filter trades by date range, comparing the ISO date prefix as a string
+        start_str = start_date.date().isoformat()
+        end_str = end_date.date().isoformat()
+        filtered_trades = [trade for trade in user_trades if start_str <= trade['executed_at'][:10] <= end_str]
         
         if not filtered_trades:
             return {
@@ -464,55 +622,39 @@ class TradingEngine:
             }
         
         # Calculate real metrics based on actual trades
-        from modules.portfolio_manager import PortfolioManager
-        from modules.market_data import MarketData
-        
-        portfolio_manager = PortfolioManager()
-        market_data = MarketData()
+        market_data = self._market_data
         
         total_trades = len(filtered_trades)
-        total_pnl = 0.0
-        winning_trades = 0
-        losing_trades = 0
-        
-        # Track buy prices for each symbol
-        symbol_buy_prices = {}
-        
-        for trade in filtered_trades:
-            symbol = trade['symbol']
-            side = trade['side']
-            price = trade['price']
-            quantity = trade['quantity']
-            
-            if side == 'buy':
-                # Store buy price for later P&L calculation
-                if symbol not in symbol_buy_prices:
-                    symbol_buy_prices[symbol] = []
-                symbol_buy_prices[symbol].append({'price': price, 'quantity': quantity})
-            else:  # sell
-                # Calculate P&L from this sell
-                if symbol in symbol_buy_prices and symbol_buy_prices[symbol]:
-                    # Use average buy price
-                    buy_records = symbol_buy_prices[symbol]
-                    total_buy_value = sum(r['price'] * r['quantity'] for r in buy_records)
-                    total_buy_quantity = sum(r['quantity'] for r in buy_records)
-                    avg_buy_price = total_buy_value / total_buy_quantity if total_buy_quantity > 0 else price
-                    
-                    trade_pnl = (price - avg_buy_price) * quantity
-                    total_pnl += trade_pnl
-                    
-                    if trade_pnl > 0:
-                        winning_trades += 1
-                    else:
-                        losing_trades += 1
-        
-        # Calculate unrealized P&L for remaining positions
-        for symbol, buy_records in symbol_buy_prices.items():
+        
+        trades_df = pd.DataFrame(filtered_trades, columns=['symbol', 'side', 'price', 'quantity'])
+        prices = trades_df['price'].to_numpy(dtype=float)
+        quantities = trades_df['quantity'].to_numpy(dtype=float)
+        is_buy = (trades_df['side'] == 'buy').to_numpy()
+        
+        # Running buy totals per symbol. Non-buy rows add nothing, so on a sell
+        # row they cover exactly the buys recorded before it.
+        buy_totals = pd.DataFrame({
+            'value': np.where(is_buy, prices * quantities, 0.0),
+            'quantity': np.where(is_buy, quantities, 0.0),
+            'count': is_buy.astype(int)
+        }).groupby(trades_df['symbol'], sort=False).cumsum()
+        buy_value = buy_totals['value'].to_numpy()
+        buy_quantity = buy_totals['quantity'].to_numpy()
+        
+        # Realized P&L of each sell against the average buy price so far
+        avg_buy_price = np.divide(buy_value, buy_quantity, out=prices.copy(), where=buy_quantity > 0)
+        closes = ~is_buy & (buy_totals['count'].to_numpy() > 0)
+        trade_pnl = (prices[closes] - avg_buy_price[closes]) * quantities[closes]
+        total_pnl = float(trade_pnl.sum())
+        winning_trades = int((trade_pnl > 0).sum())
+        losing_trades = len(trade_pnl) - winning_trades
+        
+        # Calculate unrealized P&L for remaining positions, one price lookup per symbol
+        buys = trades_df[is_buy]
+        for symbol, symbol_buys in buys.groupby('symbol', sort=False):
             try:
                 current_price = market_data.get_current_price(symbol)
-                for record in buy_records:
-                    unrealized_pnl = (current_price - record['price']) * record['quantity']
-                    total_pnl += unrealized_pnl
+                total_pnl += float(((current_price - symbol_buys['price']) * symbol_buys['quantity']).sum())
             except:
                 # Skip if can't get current price
                 pass
@@ -534,72 +676,45 @@ class TradingEngine:
         trades = self._load_json(self.trades_file)
         
         user_trades = trades.get(user_id, [])
+        executed_at = pd.Series([trade['executed_at'] for trade in user_trades], dtype=object)
         
-        # Filter trades by date range
-        filtered_trades = []
-        for trade in user_trades:
-            trade_date = datetime.fromisoformat(trade['executed_at']).date()
-            if start_date.date() <= trade_date <= end_date.date():
-                filtered_trades.append(trade)
+        # Filter trades by date range, comparing the ISO date prefix as a string
+        in_range = executed_at.str.slice(0, 10).between(start_date.date().isoformat(), end_date.date().isoformat())
+        executed_at = executed_at[in_range].reset_index(drop=True)
         
-        if not filtered_trades:
+        if executed_at.empty:
             return pd.DataFrame(columns=['date', 'pnl', 'cumulative_pnl'])
         
         # Create DataFrame and add mock P&L
-        df = pd.DataFrame(filtered_trades)
-        df['date'] = pd.to_datetime(df['executed_at']).dt.date
+        df = pd.DataFrame({'date': pd.to_datetime(executed_at, format='ISO8601').dt.date})
         
         # Mock P&L per trade
-        df['pnl'] = [random.uniform(-500, 1000) for _ in range(len(df))]
+        df['pnl'] = np.random.uniform(-500, 1000, size=len(df))
         df['cumulative_pnl'] = df['pnl'].cumsum()
         
         return df[['date', 'pnl', 'cumulative_pnl']]
     
     def cancel_order(self, user_id: str, order_id: str) -> Dict:
         """Cancel a pending order."""
-        orders = self._load_json(self.orders_file)
-        
-        user_orders = orders.get(user_id, [])
+        orders = self._load_orders()
         
         # Find and cancel order
-        for i, order in enumerate(user_orders):
-            if order['order_id'] == order_id:
-                if order['status'] == 'pending':
-                    orders[user_id][i]['status'] = 'cancelled'
-                    orders[user_id][i]['cancelled_at'] = datetime.now().isoformat()
-                    self._save_json(self.orders_file, orders)
-                    return {"success": True, "message": "Order cancelled successfully"}
-                else:
-                    return {"success": False, "message": f"Cannot cancel order with status: {order['status']}"}
-        
-        return {"success": False, "message": "Order not found"}
+        order = self._order_index.get((user_id, order_id))
+        if order is None:
+            return {"success": False, "message": "Order not found"}
+        
+        if order['status'] != 'pending':
+            return {"success": False, "message": f"Cannot cancel order with status: {order['status']}"}
+        
+        order['status'] = 'cancelled'
+        order['cancelled_at'] = datetime.now().isoformat()
+        self._save_json(self.orders_file, orders)
+        return {"success": True, "message": "Order cancelled successfully"}
     
     def get_daily_trade_count(self) -> int:
         """Get total trades across all users today (admin function)."""
-        trades = self._load_json(self.trades_file)
-        
-        today = datetime.now().date()
-        total_trades = 0
-        
-        for user_trades in trades.values():
-            for trade in user_trades:
-                trade_date = datetime.fromisoformat(trade['executed_at']).date()
-                if trade_date == today:
-                    total_trades += 1
-        
-        return total_trades
+        return self._daily_stats()[0]
     
     def get_daily_volume(self) -> float:
         """Get total trading volume today (admin function)."""
-        trades = self._load_json(self.trades_file)
-        
-        today = datetime.now().date()
-        total_volume = 0.0
-        
-        for user_trades in trades.values():
-            for trade in user_trades:
-                trade_date = datetime.fromisoformat(trade['executed_at']).date()
-                if trade_date == today:
-                    total_volume += trade['value']
-        
-        return total_volume
\ No newline at end of file
+        return self._daily_stats()[1]
\ No newline at end of file
@@ -1,16 +1,46 @@
 import json
 import os
+import numpy as np
 import pandas as pd
+from functools import lru_cache
 from typing import Dict, List
 from datetime import datetime, timedelta
 from modules.market_data import MarketData
 
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library serializer
+    orjson = None
+
+# Parsed JSON files shared across instances, which Streamlit recreates on every
+# rerun: path -> ((mtime_ns, size), data)
+_FILE_CACHE = {}
+
+# Sector mapping for major stocks, kept as a Series so Series.map can look it up
+# without converting a dict on every call
+_SECTOR_MAPPING = pd.Series({
+    'AAPL': 'Technology', 'MSFT': 'Technology', 'GOOGL': 'Technology', 'AMZN': 'Technology',
+    'TSLA': 'Automotive', 'NVDA': 'Technology', 'META': 'Technology', 'NFLX': 'Technology',
+    'JPM': 'Financial', 'BAC': 'Financial', 'WFC': 'Financial', 'GS': 'Financial',
+    'JNJ': 'Healthcare', 'PFE': 'Healthcare', 'UNH': 'Healthcare', 'ABBV': 'Healthcare',
+    'XOM': 'Energy', 'CVX': 'Energy', 'COP': 'Energy', 'SLB': 'Energy',
+    'WMT': 'Retail', 'HD': 'Retail', 'COST': 'Retail', 'TGT': 'Retail',
+    'KO': 'Consumer Goods', 'PEP': 'Consumer Goods', 'PG': 'Consumer Goods', 'MCD': 'Consumer Goods'
+}, name='sector')
+
+
+@lru_cache(maxsize=1)
+def _market_data() -> MarketData:
+    """Get the MarketData shared by every TradingHistory, so its price caches survive Streamlit reruns."""
+    return MarketData()
+
 
 class TradingHistory:
     """Manages detailed trading history and investment outcomes."""
     
     def __init__(self):
-        self.market_data = MarketData()
+        self.market_data = _market_data()
         self.trades_file = "data/trades.json"
         self.users_file = "data/users.json"
         self._ensure_data_directory()
@@ -19,22 +49,41 @@ class TradingHistory:
         """Create data directory if it doesn't exist."""
         os.makedirs("data", exist_ok=True)
     
+    def _load_json(self, file_path: str) -> Dict:
+        """Load a JSON file, reusing the parsed copy while the file is unchanged."""
+        stat = os.stat(file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = _FILE_CACHE.get(file_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        data = orjson.loads(raw) if orjson else json.loads(raw)
+        _FILE_CACHE[file_path] = (signature, data)
+        return data
+    
     def _load_trades(self) -> Dict:
         """Load trades from file."""
         try:
-            with open(self.trades_file, 'r') as f:
-                return json.load(f)
+            return self._load_json(self.trades_file)
         except FileNotFoundError:
             return {}
     
     def _load_users(self) -> Dict:
         """Load users from file."""
         try:
-            with open(self.users_file, 'r') as f:
-                return json.load(f)
+            return self._load_json(self.users_file)
         except FileNotFoundError:
             return {}
     
+    def _realized_pnl(self, df: pd.DataFrame) -> pd.Series:
+        """Get realized P&L for sells that carry an average buy price, NaN for every other trade."""
+        if 'avg_buy_price' not in df:
+            return pd.Series(np.nan, index=df.index)
+        pnl = (df['price'] - df['avg_buy_price']) * df['quantity']
+        return pnl.where(df['order_type'] == 'sell')
+    
     def get_user_trading_history(self, user_id: str, days: int = 30) -> pd.DataFrame:
         """Get comprehensive trading history for a user."""
         trades = self._load_trades()
@@ -48,42 +97,51 @@ class TradingHistory:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        filtered_trades = []
-        for trade in user_trades:
-            trade_date = datetime.fromisoformat(trade['timestamp'])
-            if start_date <= trade_date <= end_date:
-                # Calculate P&L for completed trades
-                trade_copy = trade.copy()
-                
-                if trade['order_type'] == 'sell':
-                    # Find corresponding buy trade for P&L calculation
-                    buy_price = trade.get('avg_buy_price', trade['price'])
-                    trade_copy['pnl'] = (trade['price'] - buy_price) * trade['quantity']
-                    trade_copy['pnl_percentage'] = ((trade['price'] - buy_price) / buy_price) * 100
-                else:
-                    # For buy orders, calculate unrealized P&L
-                    current_price = self.market_data.get_current_price(trade['symbol'])
-                    trade_copy['pnl'] = (current_price - trade['price']) * trade['quantity']
-                    trade_copy['pnl_percentage'] = ((current_price - trade['price']) / trade['price']) * 100
-                    trade_copy['current_price'] = current_price
-                
-                # Add holding period for sells
-                if trade['order_type'] == 'sell' and 'buy_date' in trade:
-                    buy_date = datetime.fromisoformat(trade['buy_date'])
-                    holding_period = (trade_date - buy_date).days
-                    trade_copy['holding_period_days'] = holding_period
-                
-                filtered_trades.append(trade_copy)
-        
-        df = pd.DataFrame(filtered_trades)
-        
-        if not df.empty:
-            df = df.sort_values('timestamp', ascending=False)
-            
-            # Add formatted columns for display
-            df['trade_date'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d %H:%M')
-            df['total_value'] = df['quantity'] * df['price']
-            
+        df = pd.DataFrame(user_trades)
+        if df.empty:
+            return df
+        
+        trade_dates = pd.to_datetime(df['timestamp'], format='ISO8601')
+        in_range = trade_dates.between(start_date, end_date)
+        # Drop fields that only appeared on trades outside the window
+        df = df.loc[in_range].dropna(axis=1, how='all').reset_index(drop=True)
+        if df.empty:
+            return pd.DataFrame()
+        trade_dates = trade_dates.loc[in_range].reset_index(drop=True)
+        
+        is_sell = (df['order_type'] == 'sell').to_numpy()
+        
+        # Realized P&L for sells against their average buy price
+        if 'avg_buy_price' in df:
+            buy_price = df['avg_buy_price'].fillna(df['price'])
+        else:
+            buy_price = df['price']
+        
+        # Unrealized P&L for buys, priced in one batched lookup per open symbol
+        buy_symbols = df.loc[~is_sell, 'symbol']
+        prices = self.market_data.get_current_prices(buy_symbols.unique())
+        current_price = buy_symbols.map(prices).reindex(df.index)
+        
+        cost = np.where(is_sell, buy_price, df['price'])
+        value = np.where(is_sell, df['price'], current_price)
+        df['pnl'] = (value - cost) * df['quantity']
+        df['pnl_percentage'] = (value - cost) / cost * 100
+        if not is_sell.all():
+            df['current_price'] = current_price
+        
+        # Add holding period for sells
+        if 'buy_date' in df:
+            has_buy_date = is_sell & df['buy_date'].notna().to_numpy()
+            if has_buy_date.any():
+                buy_dates = pd.to_datetime(df['buy_date'].where(has_buy_date), format='ISO8601')
+                df['holding_period_days'] = (trade_dates - buy_dates).dt.days
+        
+        df = df.sort_values('timestamp', ascending=False)
+        
+        # Add formatted columns for display
+        df['trade_date'] = trade_dates.loc[df.index].dt.strftime('%Y-%m-%d %H:%M')
+        df['total_value'] = df['quantity'] * df['price']
+        
         return df
     
     def get_investment_outcomes(self, user_id: str) -> Dict:
@@ -107,71 +165,36 @@ class TradingHistory:
         
         # Calculate statistics
         total_trades = len(user_trades)
-        profitable_trades = 0
-        losing_trades = 0
-        total_pnl = 0
-        trade_pnls = []
-        holding_periods = []
-        symbol_counts = {}
-        
-        best_trade = None
-        worst_trade = None
-        max_profit = float('-inf')
-        max_loss = float('inf')
-        
-        for trade in user_trades:
-            if trade['order_type'] == 'sell' and 'avg_buy_price' in trade:
-                # Calculate P&L for completed trades
-                buy_price = trade['avg_buy_price']
-                sell_price = trade['price']
-                quantity = trade['quantity']
-                
-                pnl = (sell_price - buy_price) * quantity
-                trade_pnls.append(pnl)
-                total_pnl += pnl
-                
-                if pnl > 0:
-                    profitable_trades += 1
-                    if pnl > max_profit:
-                        max_profit = pnl
-                        best_trade = {
-                            'symbol': trade['symbol'],
-                            'quantity': quantity,
-                            'buy_price': buy_price,
-                            'sell_price': sell_price,
-                            'pnl': pnl,
-                            'pnl_percentage': ((sell_price - buy_price) / buy_price) * 100,
-                            'date': trade['timestamp']
-                        }
-                elif pnl < 0:
-                    losing_trades += 1
-                    if pnl < max_loss:
-                        max_loss = pnl
-                        worst_trade = {
-                            'symbol': trade['symbol'],
-                            'quantity': quantity,
-                            'buy_price': buy_price,
-                            'sell_price': sell_price,
-                            'pnl': pnl,
-                            'pnl_percentage': ((sell_price - buy_price) / buy_price) * 100,
-                            'date': trade['timestamp']
-                        }
-                
-                # Calculate holding period
-                if 'buy_date' in trade:
-                    buy_date = datetime.fromisoformat(trade['buy_date'])
-                    sell_date = datetime.fromisoformat(trade['timestamp'])
-                    holding_period = (sell_date - buy_date).days
-                    holding_periods.append(holding_period)
-            
-            # Count symbols
-            symbol = trade['symbol']
-            symbol_counts[symbol] = symbol_counts.get(symbol, 0) + 1
+        df = pd.DataFrame(user_trades)
+        
+        # P&L of completed trades, indexed by position in user_trades
+        trade_pnls = self._realized_pnl(df).dropna()
+        gains = trade_pnls[trade_pnls > 0]
+        losses = trade_pnls[trade_pnls < 0]
+        
+        profitable_trades = len(gains)
+        losing_trades = len(losses)
+        total_pnl = float(trade_pnls.sum()) if not trade_pnls.empty else 0
+        
+        # idxmax/idxmin keep the earliest trade on ties
+        best_trade = self._closed_trade_summary(user_trades[gains.idxmax()]) if profitable_trades else None
+        worst_trade = self._closed_trade_summary(user_trades[losses.idxmin()]) if losing_trades else None
+        
+        # Calculate holding period
+        average_holding_period = 0
+        if 'buy_date' in df:
+            closed = df.loc[trade_pnls.index]
+            closed = closed[closed['buy_date'].notna()]
+            if not closed.empty:
+                holding_periods = (
+                    pd.to_datetime(closed['timestamp'], format='ISO8601')
+                    - pd.to_datetime(closed['buy_date'], format='ISO8601')
+                ).dt.days
+                average_holding_period = float(holding_periods.mean())
         
         # Calculate derived statistics
         win_rate = (profitable_trades / total_trades * 100) if total_trades > 0 else 0
-        average_holding_period = sum(holding_periods) / len(holding_periods) if holding_periods else 0
-        most_traded_symbol = max(symbol_counts.keys(), key=lambda k: symbol_counts[k]) if symbol_counts else None
+        most_traded_symbol = df['symbol'].value_counts(sort=False).idxmax() if total_trades > 0 else None
         
         return {
             "total_trades": total_trades,
@@ -186,6 +209,22 @@ class TradingHistory:
             "average_profit_per_trade": round(total_pnl / total_trades, 2) if total_trades > 0 else 0
         }
     
+    def _closed_trade_summary(self, trade: Dict) -> Dict:
+        """Summarize a completed sell trade for the best/worst trade outcomes."""
+        buy_price = trade['avg_buy_price']
+        sell_price = trade['price']
+        quantity = trade['quantity']
+        
+        return {
+            'symbol': trade['symbol'],
+            'quantity': quantity,
+            'buy_price': buy_price,
+            'sell_price': sell_price,
+            'pnl': (sell_price - buy_price) * quantity,
+            'pnl_percentage': ((sell_price - buy_price) / buy_price) * 100,
+            'date': trade['timestamp']
+        }
+    
     def get_sector_analysis(self, user_id: str) -> pd.DataFrame:
         """Get trading analysis by sector."""
         trades = self._load_trades()
@@ -193,56 +232,26 @@ class TradingHistory:
         if user_id not in trades:
             return pd.DataFrame()
         
-        # Define sector mapping for major stocks
-        sector_mapping = {
-            'AAPL': 'Technology', 'MSFT': 'Technology', 'GOOGL': 'Technology', 'AMZN': 'Technology',
-            'TSLA': 'Automotive', 'NVDA': 'Technology', 'META': 'Technology', 'NFLX': 'Technology',
-            'JPM': 'Financial', 'BAC': 'Financial', 'WFC': 'Financial', 'GS': 'Financial',
-            'JNJ': 'Healthcare', 'PFE': 'Healthcare', 'UNH': 'Healthcare', 'ABBV': 'Healthcare',
-            'XOM': 'Energy', 'CVX': 'Energy', 'COP': 'Energy', 'SLB': 'Energy',
-            'WMT': 'Retail', 'HD': 'Retail', 'COST': 'Retail', 'TGT': 'Retail',
-            'KO': 'Consumer Goods', 'PEP': 'Consumer Goods', 'PG': 'Consumer Goods', 'MCD': 'Consumer Goods'
-        }
+        df = pd.DataFrame(trades[user_id])
+        if df.empty:
+            return df
         
-        user_trades = trades[user_id]
-        sector_data = {}
-        
-        for trade in user_trades:
-            symbol = trade['symbol']
-            sector = sector_mapping.get(symbol, 'Other')
-            
-            if sector not in sector_data:
-                sector_data[sector] = {
-                    'trades': 0,
-                    'total_volume': 0,
-                    'total_pnl': 0,
-                    'symbols': set()
-                }
-            
-            sector_data[sector]['trades'] += 1
-            sector_data[sector]['total_volume'] += trade['quantity'] * trade['price']
-            sector_data[sector]['symbols'].add(symbol)
-            
-            # Calculate P&L for sell orders
-            if trade['order_type'] == 'sell' and 'avg_buy_price' in trade:
-                pnl = (trade['price'] - trade['avg_buy_price']) * trade['quantity']
-                sector_data[sector]['total_pnl'] += pnl
-        
-        # Convert to DataFrame
-        sector_analysis = []
-        for sector, data in sector_data.items():
-            sector_analysis.append({
-                'sector': sector,
-                'trades': data['trades'],
-                'total_volume': round(data['total_volume'], 2),
-                'total_pnl': round(data['total_pnl'], 2),
-                'unique_symbols': len(data['symbols']),
-                'avg_pnl_per_trade': round(data['total_pnl'] / data['trades'], 2) if data['trades'] > 0 else 0
-            })
-        
-        df = pd.DataFrame(sector_analysis)
-        if not df.empty:
-            df = df.sort_values('total_pnl', ascending=False)
+        df['sector'] = df['symbol'].map(_SECTOR_MAPPING).fillna('Other')
+        df['total_volume'] = df['quantity'] * df['price']
+        df['total_pnl'] = self._realized_pnl(df)
+        
+        sector_analysis = df.groupby('sector', sort=False).agg(
+            trades=('symbol', 'size'),
+            total_volume=('total_volume', 'sum'),
+            total_pnl=('total_pnl', 'sum'),
+            unique_symbols=('symbol', 'nunique')
+        ).reset_index()
+        
+        sector_analysis['avg_pnl_per_trade'] = (sector_analysis['total_pnl'] / sector_analysis['trades']).round(2)
+        sector_analysis['total_volume'] = sector_analysis['total_volume'].round(2)
+        sector_analysis['total_pnl'] = sector_analysis['total_pnl'].round(2)
+        
+        df = sector_analysis.sort_values('total_pnl', ascending=False)
         
         return df
     
@@ -253,48 +262,29 @@ class TradingHistory:
         if user_id not in trades:
             return pd.DataFrame()
         
-        user_trades = trades[user_id]
+        df = pd.DataFrame(trades[user_id])
+        if df.empty:
+            return df
+        
+        # Group trades by calendar month, formatting only the month labels
+        df['month'] = pd.to_datetime(df['timestamp'], format='ISO8601').dt.to_period('M')
+        df['volume'] = df['quantity'] * df['price']
+        df['pnl'] = self._realized_pnl(df)
+        df['profitable'] = df['pnl'] > 0
+        
+        monthly = df.groupby('month', sort=False).agg(
+            trades=('symbol', 'size'),
+            volume=('volume', 'sum'),
+            pnl=('pnl', 'sum'),
+            profitable_trades=('profitable', 'sum')
+        )
+        monthly.index = monthly.index.strftime('%Y-%m')
+        monthly = monthly.reset_index()
+        
+        monthly['volume'] = monthly['volume'].round(2)
+        monthly['pnl'] = monthly['pnl'].round(2)
+        monthly['win_rate'] = (monthly.pop('profitable_trades') / monthly['trades'] * 100).round(2)
         
-        # Group trades by month
-        monthly_data = {}
-        
-        for trade in user_trades:
-            trade_date = datetime.fromisoformat(trade['timestamp'])
-            month_key = trade_date.strftime('%Y-%m')
-            
-            if month_key not in monthly_data:
-                monthly_data[month_key] = {
-                    'trades': 0,
-                    'volume': 0,
-                    'pnl': 0,
-                    'profitable_trades': 0
-                }
-            
-            monthly_data[month_key]['trades'] += 1
-            monthly_data[month_key]['volume'] += trade['quantity'] * trade['price']
-            
-            # Calculate P&L for sell orders
-            if trade['order_type'] == 'sell' and 'avg_buy_price' in trade:
-                pnl = (trade['price'] - trade['avg_buy_price']) * trade['quantity']
-                monthly_data[month_key]['pnl'] += pnl
-                if pnl > 0:
-                    monthly_data[month_key]['profitable_trades'] += 1
-        
-        # Convert to DataFrame
-        monthly_performance = []
-        for month, data in monthly_data.items():
-            win_rate = (data['profitable_trades'] / data['trades'] * 100) if data['trades'] > 0 else 0
-            
-            monthly_performance.append({
-                'month': month,
-                'trades': data['trades'],
-                'volume': round(data['volume'], 2),
-                'pnl': round(data['pnl'], 2),
-                'win_rate': round(win_rate, 2)
-            })
-        
-        df = pd.DataFrame(monthly_performance)
-        if not df.empty:
-            df = df.sort_values('month', ascending=False).head(months)
+        df = monthly.sort_values('month', ascending=False).head(months)
         
         return df
\ No newline at end of file
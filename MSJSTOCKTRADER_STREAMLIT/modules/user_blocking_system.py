@@ -5,9 +5,50 @@ Allows users to block others from contacting or disturbing them.
 
 import json
 import os
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Set
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library serializer
+    orjson = None
+
+try:
+    from modules.email_service import EmailService
+    from modules.auth_manager import AuthManager
+except ImportError as e:
+    # Blocking still works, only the notification emails are skipped
+    print(f"Email service unavailable in blocking system: {str(e)}")
+    EmailService = AuthManager = None
+
+# Parsed blocked_users.json shared across instances, which Streamlit recreates
+# on every rerun: path -> ((mtime_ns, size), data)
+_FILE_CACHE = {}
+
+# Inverse of the cached blocked users data, rebuilt whenever the file changes:
+# path -> ((mtime_ns, size), {blocked_user: {blocker: None}}), with blockers
+# kept in file order
+_BLOCKED_BY_CACHE = {}
+
+# Sends block/unblock notification emails off the request path, so blocking
+# returns without waiting on SMTP
+_EMAIL_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+
+
+def _migrate_blocked_users(data: Dict) -> Dict:
+    """Convert old per-blocker block lists into dicts keyed by the blocked username."""
+    for blocker, blocks in data.items():
+        if isinstance(blocks, list):
+            data[blocker] = {
+                block["blocked_user"]: {"blocked_at": block.get("blocked_at"), "reason": block.get("reason")}
+                for block in blocks
+            }
+    return data
+
 class UserBlockingSystem:
     """Manages user blocking functionality for chat and social features."""
     
@@ -24,18 +65,72 @@ class UserBlockingSystem:
             with open(self.blocked_users_file, 'w') as f:
                 json.dump({}, f, indent=2)
     
+    def _file_signature(self) -> tuple:
+        """Get a cheap signature that changes whenever the blocked users file is rewritten."""
+        stat = os.stat(self.blocked_users_file)
+        return (stat.st_mtime_ns, stat.st_size)
+    
     def _load_blocked_users(self) -> Dict:
-        """Load blocked users data from file."""
+        """Load blocked users data from file, reusing the parsed copy while the file is unchanged."""
         try:
-            with open(self.blocked_users_file, 'r') as f:
-                return json.load(f)
+            signature = self._file_signature()
+            cached = _FILE_CACHE.get(self.blocked_users_file)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            
+            with open(self.blocked_users_file, 'rb') as f:
+                raw = f.read()
+            data = orjson.loads(raw) if orjson else json.loads(raw)
         except (FileNotFoundError, json.JSONDecodeError):
             return {}
+        
+        data = _migrate_blocked_users(data)
+        
+        _FILE_CACHE[self.blocked_users_file] = (signature, data)
+        return data
     
     def _save_blocked_users(self, data: Dict):
-        """Save blocked users data to file."""
-        with open(self.blocked_users_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Save blocked users data to file atomically and refresh the cached copy."""
+        if orjson:
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            payload = json.dumps(data, indent=2).encode()
+        
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.blocked_users_file) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+                # Make sure the data is on disk before it replaces the only copy
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.blocked_users_file)
+        except Exception:
+            # Leave the previous file intact and drop the partial temp file
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        _FILE_CACHE[self.blocked_users_file] = (self._file_signature(), data)
+    
+    def _load_blocked_by(self) -> Dict[str, Dict[str, None]]:
+        """Get the users who blocked each user, rebuilt only when the blocked users file changes."""
+        blocked_data = self._load_blocked_users()
+        cached = _FILE_CACHE.get(self.blocked_users_file)
+        if cached is None:
+            return {}
+        
+        signature = cached[0]
+        inverse = _BLOCKED_BY_CACHE.get(self.blocked_users_file)
+        if inverse is not None and inverse[0] == signature:
+            return inverse[1]
+        
+        blocked_by = defaultdict(dict)
+        for blocker, blocked_users in blocked_data.items():
+            for blocked_user in blocked_users:
+                blocked_by[blocked_user][blocker] = None
+        
+        _BLOCKED_BY_CACHE[self.blocked_users_file] = (signature, blocked_by)
+        return blocked_by
     
     def block_user(self, blocker_username: str, blocked_username: str) -> Dict:
         """Block a user from contacting the blocker."""
@@ -45,19 +140,18 @@ class UserBlockingSystem:
         blocked_data = self._load_blocked_users()
         
         if blocker_username not in blocked_data:
-            blocked_data[blocker_username] = []
+            blocked_data[blocker_username] = {}
         
         if blocked_username not in blocked_data[blocker_username]:
-            blocked_data[blocker_username].append({
-                "blocked_user": blocked_username,
+            blocked_data[blocker_username][blocked_username] = {
                 "blocked_at": datetime.now().isoformat(),
                 "reason": "User blocked via chat system"
-            })
+            }
             
             self._save_blocked_users(blocked_data)
             
             # Send email notification about blocking action
-            self._send_block_notification_email(blocker_username, blocked_username, "blocked")
+            _EMAIL_EXECUTOR.submit(self._send_block_notification_email, blocker_username, blocked_username, "blocked")
             
             return {"success": True, "message": f"Successfully blocked {blocked_username}"}
         else:
@@ -70,32 +164,24 @@ class UserBlockingSystem:
         if blocker_username not in blocked_data:
             return {"success": False, "message": f"{blocked_username} is not blocked"}
         
-        # Remove from blocked list
-        blocked_data[blocker_username] = [
-            block for block in blocked_data[blocker_username] 
-            if block["blocked_user"] != blocked_username
-        ]
+        # Remove from blocked users
+        blocked_data[blocker_username].pop(blocked_username, None)
         
-        # Clean up empty lists
+        # Clean up empty entries
         if not blocked_data[blocker_username]:
             del blocked_data[blocker_username]
         
         self._save_blocked_users(blocked_data)
         
         # Send email notification about unblocking action
-        self._send_block_notification_email(blocker_username, blocked_username, "unblocked")
+        _EMAIL_EXECUTOR.submit(self._send_block_notification_email, blocker_username, blocked_username, "unblocked")
         
         return {"success": True, "message": f"Successfully unblocked {blocked_username}"}
     
     def is_user_blocked(self, blocker_username: str, potential_blocked_username: str) -> bool:
         """Check if a user is blocked by another user."""
         blocked_data = self._load_blocked_users()
-        
-        if blocker_username not in blocked_data:
-            return False
-        
-        blocked_users = [block["blocked_user"] for block in blocked_data[blocker_username]]
-        return potential_blocked_username in blocked_users
+        return potential_blocked_username in blocked_data.get(blocker_username, {})
     
     def get_blocked_users(self, username: str) -> List[Dict]:
         """Get list of users blocked by a specific user."""
@@ -104,34 +190,32 @@ class UserBlockingSystem:
         if username not in blocked_data:
             return []
         
-        return blocked_data[username]
+        return [
+            {"blocked_user": blocked_user, **block}
+            for blocked_user, block in blocked_data[username].items()
+        ]
     
     def get_users_who_blocked(self, username: str) -> List[str]:
         """Get list of users who have blocked this user."""
-        blocked_data = self._load_blocked_users()
-        blockers = []
-        
-        for blocker, blocked_list in blocked_data.items():
-            blocked_users = [block["blocked_user"] for block in blocked_list]
-            if username in blocked_users:
-                blockers.append(blocker)
-        
-        return blockers
+        return list(self._load_blocked_by().get(username, ()))
     
     def can_users_interact(self, user1: str, user2: str) -> bool:
         """Check if two users can interact (neither has blocked the other)."""
-        return not (self.is_user_blocked(user1, user2) or self.is_user_blocked(user2, user1))
+        blocked_data = self._load_blocked_users()
+        return not (user2 in blocked_data.get(user1, {}) or user1 in blocked_data.get(user2, {}))
     
     def filter_blocked_users_from_list(self, requesting_user: str, user_list: List[str]) -> List[str]:
         """Filter out blocked users from a list."""
-        return [user for user in user_list if self.can_users_interact(requesting_user, user)]
+        my_blocks = self._load_blocked_users().get(requesting_user, {})
+        blocked_by = self._load_blocked_by().get(requesting_user, ())
+        return [user for user in user_list if user not in my_blocks and user not in blocked_by]
     
     def _send_block_notification_email(self, blocker_username: str, blocked_username: str, action: str):
         """Send email notification for blocking/unblocking actions."""
+        if EmailService is None:
+            return
+        
         try:
-            from modules.email_service import EmailService
-            from modules.auth_manager import AuthManager
-            
             email_service = EmailService()
             auth_manager = AuthManager()
             
@@ -1,10 +1,26 @@
 import pandas as pd
+import copy
 import json
 import os
+import tempfile
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 import uuid
 
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library serializer
+    orjson = None
+
+# Parsed users.json shared across instances, which Streamlit recreates on every
+# rerun: path -> ((mtime_ns, size), data)
+_FILE_CACHE = {}
+
+# user_id -> username index of the cached users, rebuilt whenever the file
+# changes: path -> ((mtime_ns, size), {user_id: username})
+_ID_INDEX_CACHE = {}
+
 class UserManager:
     """Manages user administration and statistics."""
     
@@ -16,47 +32,95 @@ class UserManager:
         """Create data directory if it doesn't exist."""
         os.makedirs("data", exist_ok=True)
     
+    def _file_signature(self) -> tuple:
+        """Get a cheap signature that changes whenever users.json is rewritten."""
+        stat = os.stat(self.users_file)
+        return (stat.st_mtime_ns, stat.st_size)
+    
     def _load_users(self) -> Dict:
-        """Load users from file."""
+        """Load users from file, reusing the parsed copy while the file is unchanged."""
         try:
-            with open(self.users_file, 'r') as f:
-                return json.load(f)
+            signature = self._file_signature()
+            cached = _FILE_CACHE.get(self.users_file)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            
+            with open(self.users_file, 'rb') as f:
+                raw = f.read()
+            users = orjson.loads(raw) if orjson else json.loads(raw)
         except (FileNotFoundError, json.JSONDecodeError):
             return {}
+        
+        _FILE_CACHE[self.users_file] = (signature, users)
+        return users
+    
+    def _load_users_for_update(self) -> Dict:
+        """Load users as a copy whose records can be replaced without touching the shared cache."""
+        # The cached dict is shared by every session, so it only changes once a save succeeds
+        return dict(self._load_users())
     
     def _save_users(self, users: Dict):
-        """Save users to file."""
-        with open(self.users_file, 'w') as f:
-            json.dump(users, f, indent=2)
+        """Save users to file atomically and refresh the cached copy."""
+        if orjson:
+            payload = orjson.dumps(users, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            payload = json.dumps(users, indent=2).encode()
+        
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.users_file) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+                # Make sure the data is on disk before it replaces the only copy
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.users_file)
+        except Exception:
+            # Leave the previous file intact and drop the partial temp file
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        _FILE_CACHE[self.users_file] = (self._file_signature(), users)
+    
+    def _find_username(self, user_id: str) -> Optional[str]:
+        """Get the username for a user_id, using an index rebuilt only when users.json changes."""
+        users = self._load_users()
+        cached = _FILE_CACHE.get(self.users_file)
+        if cached is None:
+            return None
+        
+        signature = cached[0]
+        index = _ID_INDEX_CACHE.get(self.users_file)
+        if index is None or index[0] != signature:
+            id_index = {}
+            for username, user_data in users.items():
+                # Keep the first user with an ID, as the old linear scans did
+                id_index.setdefault(user_data.get('user_id'), username)
+            index = (signature, id_index)
+            _ID_INDEX_CACHE[self.users_file] = index
+        
+        return index[1].get(user_id)
+    
+    def _user_dates(self, users: Dict, field: str) -> pd.Series:
+        """Get the 'YYYY-MM-DD' date of an ISO timestamp field for every user that has one."""
+        timestamps = pd.Series([user.get(field) for user in users.values()], dtype=object)
+        # The first 10 characters of an ISO timestamp are its date
+        return timestamps[timestamps.astype(bool)].str[:10]
     
     def get_user_statistics(self) -> Dict:
         """Get user statistics for admin dashboard."""
         users = self._load_users()
         
         total_users = len(users)
-        active_today = 0
-        new_this_month = 0
-        premium_users = 0
+        today = datetime.now().date().isoformat()
+        month_start = datetime.now().replace(day=1).date().isoformat()
         
-        today = datetime.now().date()
-        month_start = datetime.now().replace(day=1).date()
+        roles = pd.Series([user.get('role') for user in users.values()], dtype=object)
+        premium_users = int(roles.isin(['premium', 'trader']).sum())
         
-        for user in users.values():
-            # Count premium users
-            if user.get('role') in ['premium', 'trader']:
-                premium_users += 1
-            
-            # Count users active today
-            if user.get('last_login'):
-                last_login_date = datetime.fromisoformat(user['last_login']).date()
-                if last_login_date == today:
-                    active_today += 1
-            
-            # Count new users this month
-            if user.get('created_at'):
-                created_date = datetime.fromisoformat(user['created_at']).date()
-                if created_date >= month_start:
-                    new_this_month += 1
+        # ISO dates compare correctly as strings
+        active_today = int((self._user_dates(users, 'last_login') == today).sum())
+        new_this_month = int((self._user_dates(users, 'created_at') >= month_start).sum())
         
         return {
             'total_users': total_users,
@@ -72,94 +136,85 @@ class UserManager:
         if not users:
             return pd.DataFrame(columns=['user_id', 'username', 'email', 'role', 'account_type', 'created_at', 'last_login', 'is_active'])
         
-        users_list = []
-        for username, user_data in users.items():
-            users_list.append({
-                'user_id': user_data.get('user_id', ''),
-                'username': username,
-                'email': user_data.get('email', ''),
-                'first_name': user_data.get('first_name', ''),
-                'last_name': user_data.get('last_name', ''),
-                'role': user_data.get('role', 'basic'),
-                'account_type': user_data.get('account_type', 'Individual'),
-                'created_at': user_data.get('created_at', ''),
-                'last_login': user_data.get('last_login', 'Never'),
-                'is_active': user_data.get('is_active', True),
-                'failed_login_attempts': user_data.get('failed_login_attempts', 0)
-            })
-        
-        return pd.DataFrame(users_list)
+        # Build each column directly instead of a dict per user
+        user_records = users.values()
+        return pd.DataFrame({
+            'user_id': [user_data.get('user_id', '') for user_data in user_records],
+            'username': list(users),
+            'email': [user_data.get('email', '') for user_data in user_records],
+            'first_name': [user_data.get('first_name', '') for user_data in user_records],
+            'last_name': [user_data.get('last_name', '') for user_data in user_records],
+            'role': [user_data.get('role', 'basic') for user_data in user_records],
+            'account_type': [user_data.get('account_type', 'Individual') for user_data in user_records],
+            'created_at': [user_data.get('created_at', '') for user_data in user_records],
+            'last_login': [user_data.get('last_login', 'Never') for user_data in user_records],
+            'is_active': [user_data.get('is_active', True) for user_data in user_records],
+            'failed_login_attempts': [user_data.get('failed_login_attempts', 0) for user_data in user_records]
+        })
     
     def suspend_user(self, user_id: str) -> Dict:
         """Suspend a user account."""
-        users = self._load_users()
-        
-        # Find user by ID
-        for username, user_data in users.items():
-            if user_data.get('user_id') == user_id:
-                user_data['is_active'] = False
-                user_data['suspended_at'] = datetime.now().isoformat()
-                users[username] = user_data
-                self._save_users(users)
-                return {"success": True, "message": f"User {username} suspended successfully"}
+        users = self._load_users_for_update()
+        username = self._find_username(user_id)
+        if username is None:
+            return {"success": False, "message": "User not found"}
         
-        return {"success": False, "message": "User not found"}
+        user_data = users[username] = dict(users[username])
+        user_data['is_active'] = False
+        user_data['suspended_at'] = datetime.now().isoformat()
+        self._save_users(users)
+        return {"success": True, "message": f"User {username} suspended successfully"}
     
     def activate_user(self, user_id: str) -> Dict:
         """Activate a suspended user account."""
-        users = self._load_users()
-        
-        # Find user by ID
-        for username, user_data in users.items():
-            if user_data.get('user_id') == user_id:
-                user_data['is_active'] = True
-                user_data['failed_login_attempts'] = 0
-                if 'suspended_at' in user_data:
-                    del user_data['suspended_at']
-                users[username] = user_data
-                self._save_users(users)
-                return {"success": True, "message": f"User {username} activated successfully"}
+        users = self._load_users_for_update()
+        username = self._find_username(user_id)
+        if username is None:
+            return {"success": False, "message": "User not found"}
         
-        return {"success": False, "message": "User not found"}
+        user_data = users[username] = dict(users[username])
+        user_data['is_active'] = True
+        user_data['failed_login_attempts'] = 0
+        if 'suspended_at' in user_data:
+            del user_data['suspended_at']
+        self._save_users(users)
+        return {"success": True, "message": f"User {username} activated successfully"}
     
     def delete_user(self, user_id: str) -> Dict:
         """Delete a user account (use with caution)."""
-        users = self._load_users()
+        users = self._load_users_for_update()
+        username = self._find_username(user_id)
+        if username is None:
+            return {"success": False, "message": "User not found"}
+        
+        del users[username]
+        self._save_users(users)
         
-        # Find and delete user by ID
-        for username, user_data in users.items():
-            if user_data.get('user_id') == user_id:
-                del users[username]
-                self._save_users(users)
-                
-                # In a real application, you would also need to:
-                # - Delete user's portfolio data
-                # - Delete user's trading history
-                # - Handle any open positions
-                
-                return {"success": True, "message": f"User {username} deleted successfully"}
+        # In a real application, you would also need to:
+        # - Delete user's portfolio data
+        # - Delete user's trading history
+        # - Handle any open positions
         
-        return {"success": False, "message": "User not found"}
+        return {"success": True, "message": f"User {username} deleted successfully"}
     
     def update_user_role(self, user_id: str, new_role: str) -> Dict:
         """Update user role."""
-        users = self._load_users()
+        users = self._load_users_for_update()
         
         valid_roles = ["basic", "trader", "premium", "admin"]
         if new_role not in valid_roles:
             return {"success": False, "message": f"Invalid role. Must be one of: {valid_roles}"}
         
-        # Find user by ID
-        for username, user_data in users.items():
-            if user_data.get('user_id') == user_id:
-                old_role = user_data.get('role', 'basic')
-                user_data['role'] = new_role
-                user_data['role_updated_at'] = datetime.now().isoformat()
-                users[username] = user_data
-                self._save_users(users)
-                return {"success": True, "message": f"User {username} role updated from {old_role} to {new_role}"}
+        username = self._find_username(user_id)
+        if username is None:
+            return {"success": False, "message": "User not found"}
         
-        return {"success": False, "message": "User not found"}
+        user_data = users[username] = dict(users[username])
+        old_role = user_data.get('role', 'basic')
+        user_data['role'] = new_role
+        user_data['role_updated_at'] = datetime.now().isoformat()
+        self._save_users(users)
+        return {"success": True, "message": f"User {username} role updated from {old_role} to {new_role}"}
     
     def get_user_activity(self, days: int = 30) -> pd.DataFrame:
         """Get user activity statistics."""
@@ -168,35 +223,17 @@ class UserManager:
         # Create date range
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
-        date_range = [start_date + timedelta(days=i) for i in range(days)]
-        
-        activity_data = []
+        date_range = pd.date_range(start_date.date(), periods=days).strftime('%Y-%m-%d')
         
-        for date in date_range:
-            date_str = date.strftime('%Y-%m-%d')
-            daily_logins = 0
-            daily_registrations = 0
-            
-            for user in users.values():
-                # Count logins
-                if user.get('last_login'):
-                    login_date = datetime.fromisoformat(user['last_login']).date()
-                    if login_date == date.date():
-                        daily_logins += 1
-                
-                # Count registrations
-                if user.get('created_at'):
-                    created_date = datetime.fromisoformat(user['created_at']).date()
-                    if created_date == date.date():
-                        daily_registrations += 1
-            
-            activity_data.append({
-                'date': date_str,
-                'logins': daily_logins,
-                'registrations': daily_registrations
-            })
+        # Count each day's logins and registrations in one pass over the users
+        logins = self._user_dates(users, 'last_login').value_counts()
+        registrations = self._user_dates(users, 'created_at').value_counts()
         
-        return pd.DataFrame(activity_data)
+        return pd.DataFrame({
+            'date': date_range,
+            'logins': logins.reindex(date_range, fill_value=0).to_numpy(),
+            'registrations': registrations.reindex(date_range, fill_value=0).to_numpy()
+        })
     
     def get_role_distribution(self) -> Dict:
         """Get distribution of user roles."""
@@ -212,33 +249,23 @@ class UserManager:
     
     def search_users(self, query: str) -> pd.DataFrame:
         """Search users by username, email, or name."""
-        users = self._load_users()
+        users_df = self.get_all_users()
+        if users_df.empty:
+            return pd.DataFrame()
         
-        matching_users = []
+        # Search in username, email, first name, last name
         query_lower = query.lower()
+        matches = pd.Series(False, index=users_df.index)
+        for field in ['username', 'email', 'first_name', 'last_name']:
+            matches |= users_df[field].str.lower().str.contains(query_lower, regex=False)
         
-        for username, user_data in users.items():
-            # Search in username, email, first name, last name
-            searchable_fields = [
-                username.lower(),
-                user_data.get('email', '').lower(),
-                user_data.get('first_name', '').lower(),
-                user_data.get('last_name', '').lower()
-            ]
-            
-            if any(query_lower in field for field in searchable_fields):
-                matching_users.append({
-                    'user_id': user_data.get('user_id', ''),
-                    'username': username,
-                    'email': user_data.get('email', ''),
-                    'first_name': user_data.get('first_name', ''),
-                    'last_name': user_data.get('last_name', ''),
-                    'role': user_data.get('role', 'basic'),
-                    'account_type': user_data.get('account_type', 'Individual'),
-                    'is_active': user_data.get('is_active', True)
-                })
+        matching_users = users_df.loc[matches, [
+            'user_id', 'username', 'email', 'first_name', 'last_name', 'role', 'account_type', 'is_active'
+        ]]
+        if matching_users.empty:
+            return pd.DataFrame()
         
-        return pd.DataFrame(matching_users)
+        return matching_users.reset_index(drop=True)
     
     def export_users_csv(self, filepath: str = "data/users_export.csv") -> Dict:
         """Export users data to CSV."""
@@ -252,13 +279,12 @@ class UserManager:
     def get_user_details(self, user_id: str) -> Dict:
         """Get detailed information about a specific user."""
         users = self._load_users()
+        username = self._find_username(user_id)
+        if username is None:
+            return {"success": False, "message": "User not found"}
         
-        for username, user_data in users.items():
-            if user_data.get('user_id') == user_id:
-                return {
-                    "success": True,
-                    "user_data": user_data,
-                    "username": username
-                }
-        
-        return {"success": False, "message": "User not found"}
\ No newline at end of file
+        return {
+            "success": True,
+            "user_data": copy.deepcopy(users[username]),
+            "username": username
+        }
\ No newline at end of file
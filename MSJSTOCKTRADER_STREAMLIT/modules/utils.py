@@ -1,39 +1,52 @@
 import streamlit as st
+import io
+import json
+import math
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 
-def initialize_session_state():
-    """Initialize all required session state variables."""
-    
+# Session state defaults set by initialize_session_state; mutable defaults are
+# factories so every session gets its own list
+_SESSION_DEFAULTS = {
     # Current dataset
-    if 'current_dataset' not in st.session_state:
-        st.session_state.current_dataset = None
-    
-    if 'dataset_name' not in st.session_state:
-        st.session_state.dataset_name = ""
-    
+    'current_dataset': None,
+    'dataset_name': "",
     # Dashboard builder
-    if 'dashboard_charts' not in st.session_state:
-        st.session_state.dashboard_charts = []
-    
-    if 'current_dashboard' not in st.session_state:
-        st.session_state.current_dashboard = None
-    
+    'dashboard_charts': list,
+    'current_dashboard': None,
     # Saved dashboards
-    if 'saved_dashboards' not in st.session_state:
-        st.session_state.saved_dashboards = []
-    
+    'saved_dashboards': list,
     # Chat history
-    if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
+    'chat_history': list
+}
+
+def initialize_session_state():
+    """Initialize all required session state variables."""
+    # Check every key on each run so defaults come back after a key is deleted
+    for key, default in _SESSION_DEFAULTS.items():
+        if key not in st.session_state:
+            st.session_state[key] = default() if callable(default) else default
 
 def format_price(price):
     """Format price with appropriate precision based on value."""
-    if pd.isna(price) or price is None:
+    if price is None:
         return "N/A"
     
     if not isinstance(price, (int, float)):
-        return str(price)
+        # Other missing markers such as pd.NA and NaT
+        return "N/A" if pd.isna(price) else str(price)
     
+    # NaN is the only float that is not equal to itself
+    if price != price:
+        return "N/A"
+    
+    # The sign keeps -0.0 from sharing a cache entry with 0.0, which compares equal
+    return _format_price_value(price, math.copysign(1.0, price))
+
+@lru_cache(maxsize=4096)
+def _format_price_value(price, sign):
+    """Format a non-missing numeric price, cached because the same prices repeat across a page."""
     # Use variable precision based on price range
     if price >= 1.0:
         return f"${price:.2f}"
@@ -44,21 +57,72 @@ def format_price(price):
     else:
         return f"${price:.8f}"
 
+# Lower bounds of the format_price precision ranges, and the decimals used in
+# each range from below 0.0001 up to 1.0 and above
+_PRICE_BINS = np.array([0.0001, 0.01, 1.0])
+_PRICE_DECIMALS = (8, 6, 4, 2)
+
+def format_price_series(prices):
+    """Format a Series of prices like format_price, choosing each value's precision with NumPy."""
+    objects = prices.to_numpy(dtype=object)
+    # format_price only formats int and float values, which a float64 column always holds
+    if prices.dtype == np.float64:
+        is_number = np.ones(len(objects), dtype=bool)
+    else:
+        is_number = np.fromiter((isinstance(value, (int, float)) for value in objects), dtype=bool, count=len(objects))
+    
+    values = np.full(len(objects), np.nan)
+    values[is_number] = objects[is_number].astype(float)
+    bins = np.digitize(values, _PRICE_BINS)
+    
+    formatted = np.full(len(objects), "N/A", dtype=object)
+    valid = is_number & ~np.isnan(values)
+    for bin_index, decimals in enumerate(_PRICE_DECIMALS):
+        in_bin = valid & (bins == bin_index)
+        if in_bin.any():
+            formatted[in_bin] = np.char.mod(f"$%.{decimals}f", values[in_bin])
+    
+    # Other values are shown as they are unless they are missing
+    other = ~is_number & ~pd.isna(objects)
+    formatted[other] = [str(value) for value in objects[other]]
+    
+    return pd.Series(formatted, index=prices.index, name=prices.name)
+
 def format_number(value):
     """Format numbers for display."""
     if pd.isna(value):
         return "N/A"
     
     if isinstance(value, (int, float)):
-        if abs(value) >= 1000000:
-            return f"{value/1000000:.1f}M"
-        elif abs(value) >= 1000:
-            return f"{value/1000:.1f}K"
-        else:
-            return f"{value:.2f}"
+        # The sign keeps -0.0 from sharing a cache entry with 0.0, which compares equal
+        return _format_number_value(value, math.copysign(1.0, value))
     
     return str(value)
 
+@lru_cache(maxsize=4096)
+def _format_number_value(value, sign):
+    """Format a non-missing number, cached because the same totals repeat across a page."""
+    if abs(value) >= 1000000:
+        return f"{value/1000000:.1f}M"
+    elif abs(value) >= 1000:
+        return f"{value/1000:.1f}K"
+    else:
+        return f"{value:.2f}"
+
+def format_number_array(values):
+    """Format an array of numbers like format_number, choosing each value's suffix with np.select."""
+    values = np.asarray(values, dtype=float)
+    magnitude = np.abs(values)
+    
+    formatted = np.select(
+        [magnitude >= 1000000, magnitude >= 1000],
+        [np.char.mod("%.1fM", values / 1000000), np.char.mod("%.1fK", values / 1000)],
+        np.char.mod("%.2f", values)
+    ).astype(object)
+    formatted[np.isnan(values)] = "N/A"
+    
+    return formatted
+
 def validate_dataframe(df):
     """Validate dataframe for dashboard creation."""
     if df is None or df.empty:
@@ -69,11 +133,11 @@ def validate_dataframe(df):
     
     return True, "Valid"
 
+@st.cache_resource
 def get_sample_data():
     """Generate sample data for testing (only use if explicitly requested)."""
     # This function should only be used for testing purposes
-    import numpy as np
-    
+    # The frame is built once and shared, so callers must copy it before modifying it
     np.random.seed(42)
     
     data = {
@@ -86,45 +150,72 @@ def get_sample_data():
     
     return pd.DataFrame(data)
 
-def export_dashboard_config(dashboard):
-    """Export dashboard configuration as JSON."""
-    import json
-    
-    config = {
+def _dashboard_config(dashboard):
+    """Build the exported configuration of a dashboard."""
+    return {
         'name': dashboard['name'],
         'charts': dashboard['charts'],
         'created_at': dashboard['created_at'],
         'version': '1.0'
     }
-    
-    return json.dumps(config, indent=2)
 
+def export_dashboard_config(dashboard):
+    """Export dashboard configuration as JSON."""
+    # Share export_dashboard_config_to's serializer so both exports are identical
+    buffer = io.StringIO()
+    export_dashboard_config_to(buffer, dashboard)
+    return buffer.getvalue()
+
+def export_dashboard_config_to(buffer, dashboard):
+    """Export dashboard configuration as JSON to a text file-like object, without building the whole string."""
+    # json.dump writes the document in chunks as it encodes it
+    json.dump(_dashboard_config(dashboard), buffer, indent=2)
+
+@lru_cache(maxsize=1024)
 def clean_column_name(column_name):
     """Clean column names for better display."""
     # Replace underscores with spaces and title case
     return column_name.replace('_', ' ').title()
 
+def clean_columns(columns):
+    """Clean a whole Index of column names for better display, e.g. df.columns = clean_columns(df.columns)."""
+    # Same cleaning as clean_column_name, using pandas' vectorized string methods
+    return pd.Index(columns).str.replace('_', ' ', regex=False).str.title()
+
 def get_chart_suggestions(df):
     """Suggest appropriate chart types based on data characteristics."""
-    suggestions = []
+    # Count columns in one pass over the dtypes, with the same buckets as
+    # select_dtypes 'number' and 'object'/'category' plus any datetime64 column.
+    # Text columns use the string dtype under pandas 3, which select_dtypes
+    # still matches for 'object'.
+    numeric_count = 0
+    categorical_count = 0
+    date_count = 0
+    for dtype in df.dtypes:
+        if (pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)) \
+                or pd.api.types.is_timedelta64_dtype(dtype):
+            numeric_count += 1
+        elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype) \
+                or isinstance(dtype, pd.CategoricalDtype):
+            categorical_count += 1
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            date_count += 1
     
-    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    suggestions = []
     
-    if len(numeric_cols) >= 2:
+    if numeric_count >= 2:
         suggestions.append("Scatter Plot - Compare two numeric variables")
     
-    if len(categorical_cols) >= 1 and len(numeric_cols) >= 1:
+    if categorical_count >= 1 and numeric_count >= 1:
         suggestions.append("Bar Chart - Show numeric values by category")
         suggestions.append("Pie Chart - Show distribution of categories")
     
-    if len(numeric_cols) >= 1:
+    if numeric_count >= 1:
         suggestions.append("Histogram - Show distribution of numeric values")
         suggestions.append("Box Plot - Show statistical summary")
     
     # Check for time series data
-    date_cols = df.select_dtypes(include=['datetime']).columns.tolist()
-    if date_cols and numeric_cols:
+    if date_count and numeric_count:
         suggestions.append("Line Chart - Show trends over time")
     
     return suggestions
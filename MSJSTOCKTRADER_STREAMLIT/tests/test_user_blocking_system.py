@@ -0,0 +1,13 @@
+import json
+
+from modules.user_blocking_system import UserBlockingSystem
+
+
+def test_get_users_who_blocked_keeps_file_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    blockers = ["zoe", "adam", "mia", "bob", "kim", "lee"]
+    blocked_users = {blocker: {"target": {"blocked_at": None, "reason": None}} for blocker in blockers}
+    (tmp_path / "data" / "blocked_users.json").write_text(json.dumps(blocked_users))
+
+    assert UserBlockingSystem().get_users_who_blocked("target") == blockers
@@ -0,0 +1,49 @@
+import json
+
+import pandas as pd
+import pytest
+
+from modules.user_management import UserManager
+
+
+def test_export_users_csv_writes_columns_with_mixed_types(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    users = {
+        "alice": {"user_id": "1", "email": "alice@example.com"},
+        "bob": {"user_id": 2, "email": ["bob@example.com"], "first_name": {"given": "Bob"}},
+    }
+    (tmp_path / "data" / "users.json").write_text(json.dumps(users))
+
+    result = UserManager().export_users_csv()
+
+    assert result["success"], result["message"]
+    exported = pd.read_csv(tmp_path / "data" / "users_export.csv")
+    assert exported["username"].tolist() == ["alice", "bob"]
+    # Same layout as DataFrame.to_csv, with Python-style booleans
+    header, first_row = (tmp_path / "data" / "users_export.csv").read_text().splitlines()[:2]
+    assert header.startswith("user_id,username,email,")
+    assert first_row.startswith("1,alice,alice@example.com,")
+    assert ",True," in first_row
+
+
+def test_failed_save_and_edited_details_leave_cached_users_unchanged(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    users = {"alice": {"user_id": "1", "role": "basic", "is_active": True}}
+    (tmp_path / "data" / "users.json").write_text(json.dumps(users))
+    manager = UserManager()
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("modules.user_management.os.replace", failing_replace)
+    with pytest.raises(OSError):
+        manager.suspend_user("1")
+    monkeypatch.undo()
+    monkeypatch.chdir(tmp_path)
+
+    details = manager.get_user_details("1")
+    details["user_data"]["role"] = "admin"
+
+    assert UserManager().get_user_details("1")["user_data"] == users["alice"]
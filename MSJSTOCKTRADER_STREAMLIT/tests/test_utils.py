@@ -0,0 +1,90 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from modules import utils
+from modules.utils import (
+    _format_number_value, _format_price_value, export_dashboard_config, export_dashboard_config_to,
+    format_number, format_price, format_price_series, get_chart_suggestions
+)
+
+
+def test_negative_zero_does_not_change_cached_zero_formatting():
+    _format_price_value.cache_clear()
+    _format_number_value.cache_clear()
+
+    assert format_price(-0.0) == "$-0.00000000"
+    assert format_number(-0.0) == "-0.00"
+
+    assert format_price(0.0) == "$0.00000000"
+    assert format_price(0) == "$0.00000000"
+    assert format_number(0.0) == "0.00"
+    assert format_number(0) == "0.00"
+    assert format_number(False) == "0.00"
+
+
+def test_chart_suggestions_treat_text_and_category_columns_as_categorical():
+    values = pd.Series([1.0, 2.0])
+    not_categorical = {
+        'period': pd.Series(pd.period_range('2024-01', periods=2, freq='M')),
+        'interval': pd.Series(pd.interval_range(0, 2)),
+        'bool': pd.Series([True, False]),
+    }
+    for name, column in not_categorical.items():
+        suggestions = get_chart_suggestions(pd.DataFrame({name: column, 'value': values}))
+        assert "Bar Chart - Show numeric values by category" not in suggestions, name
+
+    categorical = [
+        pd.Series(['a', 'b']),
+        pd.Series(['a', 'b'], dtype=object),
+        pd.Series(['a', 'b'], dtype='string'),
+        pd.Series(['a', 'b'], dtype='category'),
+    ]
+    for column in categorical:
+        suggestions = get_chart_suggestions(pd.DataFrame({'label': column, 'value': values}))
+        assert "Bar Chart - Show numeric values by category" in suggestions, column.dtype
+
+
+def test_format_price_series_matches_format_price():
+    mixed = [
+        0, 1, 0.5, 0.01, 0.0099999, 0.0001, 0.00009, 123456.789, -5, -0.001, -0.0, 2.5e-9, 1e12,
+        float('inf'), float('-inf'), float('nan'), None, pd.NA, pd.NaT, True, "12.5", "abc",
+        np.int64(7), np.float32(1.5), np.float64(0.25), 10 ** 20,
+    ]
+    columns = [
+        pd.Series(mixed, dtype=object),
+        pd.Series([1.234, 0.5, np.nan, 0.00001, -3.0]),
+        pd.Series([1, 2, 3]),
+        pd.Series([True, False]),
+        pd.Series(["1.5", None, "x"]),
+    ]
+    for prices in columns:
+        assert format_price_series(prices).tolist() == [format_price(price) for price in prices]
+
+
+def test_dashboard_exports_are_identical():
+    dashboard = {
+        'name': 'Café',
+        'charts': [{'type': 'bar', 'columns': ['a', 'b']}],
+        'created_at': '2026-01-01T00:00:00',
+    }
+    buffer = io.StringIO()
+    export_dashboard_config_to(buffer, dashboard)
+
+    assert export_dashboard_config(dashboard) == buffer.getvalue()
+    assert json.loads(buffer.getvalue())['version'] == '1.0'
+
+
+def test_initialize_session_state_restores_deleted_defaults(monkeypatch):
+    session_state = {}
+    monkeypatch.setattr(utils.st, 'session_state', session_state)
+
+    utils.initialize_session_state()
+    session_state['chat_history'].append('hello')
+    del session_state['dashboard_charts']
+    utils.initialize_session_state()
+
+    assert session_state['dashboard_charts'] == []
+    assert session_state['chat_history'] == ['hello']